@@ -0,0 +1,108 @@
+import sys
+import numpy as np
+
+# Pixels added around every detected box
+PADDING = 10
+# Multi-document defaults: ignore boxes smaller than 1% of the image, and
+# boxes that are more than half covered by a larger kept box
+MIN_AREA = 0.01
+MAX_OVERLAP = 0.5
+
+
+def box_area(box):
+    return max(0.0, box[2] - box[0]) * max(0.0, box[3] - box[1])
+
+
+def pad_box(box, shape, padding=PADDING):
+    """Convert a float [x1, y1, x2, y2] box to padded int coords clipped to the image."""
+    x1, y1, x2, y2 = map(int, box)
+    h, w = shape[:2]
+    x1 = max(0, x1 - padding)
+    y1 = max(0, y1 - padding)
+    x2 = min(w, x2 + padding)
+    y2 = min(h, y2 + padding)
+    return x1, y1, x2, y2
+
+
+def find_crop_box(img: np.ndarray, model):
+    """
+    Run inference and return the padded (x1, y1, x2, y2) box of the largest
+    detection, or None if nothing was detected.
+    """
+    # Returns list of dicts: [{'box': [x1,y1,x2,y2], 'score': float, 'class_id': int}, ...]
+    results = model.run(img)
+
+    if not results:
+        print("No objects detected. Returning original.", file=sys.stderr)
+        return None
+
+    # Find largest box
+    largest_result = max(results, key=lambda x: box_area(x['box']))
+    return pad_box(largest_result['box'], img.shape)
+
+
+def run_crop(img: np.ndarray, model) -> tuple[np.ndarray, bool]:
+    """
+    Core cropping logic using NPU backend.
+    Returns: (image, was_cropped) tuple
+    """
+    box = find_crop_box(img, model)
+    if box is None:
+        return img, False
+
+    x1, y1, x2, y2 = box
+    return img[y1:y2, x1:x2], True
+
+
+def select_documents(results, shape, min_area=MIN_AREA, max_overlap=MAX_OVERLAP):
+    """
+    Pick every detection that qualifies as a separate document.
+
+    Args:
+        results: Detections from model.run().
+        shape: Image shape, used for clipping and the area threshold.
+        min_area: Minimum box area as a fraction of the image area.
+        max_overlap: Maximum fraction of a box that may be covered by a larger
+                     kept box before it is treated as part of that document.
+
+    Returns:
+        Padded (x1, y1, x2, y2) boxes in reading order (top-to-bottom, left-to-right).
+    """
+    h, w = shape[:2]
+    min_px = min_area * h * w
+
+    kept = []
+    for result in sorted(results, key=lambda x: box_area(x['box']), reverse=True):
+        x1, y1, x2, y2 = result['box']
+        box = (max(0.0, x1), max(0.0, y1), min(float(w), x2), min(float(h), y2))
+        area = box_area(box)
+        if area <= 0 or area < min_px:
+            continue
+
+        covered = False
+        for other in kept:
+            inter = box_area((max(box[0], other[0]), max(box[1], other[1]),
+                              min(box[2], other[2]), min(box[3], other[3])))
+            if inter / area > max_overlap:
+                covered = True
+                break
+        if not covered:
+            kept.append(box)
+
+    padded = [pad_box(box, shape) for box in kept]
+    return sorted(padded, key=lambda b: (b[1], b[0]))
+
+
+def run_crop_all(img: np.ndarray, model, min_area=MIN_AREA, max_overlap=MAX_OVERLAP) -> tuple[list[np.ndarray], bool]:
+    """
+    Multi-document cropping from a single inference pass.
+    Returns: (crops, was_cropped) tuple. If nothing qualifies, crops is [img].
+    """
+    results = model.run(img)
+    boxes = select_documents(results, img.shape, min_area, max_overlap) if results else []
+
+    if not boxes:
+        print("No documents detected. Returning original.", file=sys.stderr)
+        return [img], False
+
+    return [img[y1:y2, x1:x2] for x1, y1, x2, y2 in boxes], True
@@ -0,0 +1,222 @@
+"""
+Multi-page PDF / TIFF support.
+
+Pages are rasterized (PDF) or decoded (TIFF) lazily, one at a time, so memory
+stays bounded to a page or two no matter how long the document is. PDF input
+and PDF re-assembly need PyMuPDF (pip install pymupdf); TIFF only needs OpenCV.
+"""
+import struct
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from .cropping import run_crop, run_crop_all, MIN_AREA, MAX_OVERLAP
+
+try:
+    import pymupdf
+except ImportError:
+    try:
+        import fitz as pymupdf  # PyMuPDF < 1.24
+    except ImportError:
+        pymupdf = None
+
+MULTIPAGE_EXTENSIONS = {".pdf", ".tif", ".tiff"}
+
+# The model sees 640px anyway; 150 DPI keeps A4 pages around 1240x1750
+DPI = 150
+JPEG_QUALITY = 90
+
+
+def _require_pymupdf():
+    if pymupdf is None:
+        raise RuntimeError("PDF support requires PyMuPDF (pip install pymupdf)")
+
+
+def is_multipage(path):
+    """
+    True for files that go through the page-by-page path: every PDF, and TIFFs
+    with more than one page. Single-page TIFFs stay ordinary images.
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix not in MULTIPAGE_EXTENSIONS:
+        return False
+    if suffix == ".pdf":
+        return True
+    try:
+        return cv2.imcount(str(path)) > 1
+    except cv2.error:
+        return False
+
+
+def tiff_page_count(data: bytes):
+    """Count the pages (IFDs) of an in-memory TIFF without decoding any of them."""
+    order = "<" if data[:2] == b"II" else ">"
+    pages = 0
+    seen = set()
+    try:
+        version = struct.unpack_from(order + "H", data, 2)[0]
+        # Classic TIFF: 4-byte offsets, 2-byte entry counts. BigTIFF (43): 8 and 8.
+        offset_fmt, count_fmt, entry_size = ("Q", "Q", 20) if version == 43 else ("I", "H", 12)
+        offset = struct.unpack_from(order + offset_fmt, data, 8 if version == 43 else 4)[0]
+        while offset and offset not in seen:
+            seen.add(offset)
+            entries = struct.unpack_from(order + count_fmt, data, offset)[0]
+            pages += 1
+            offset = struct.unpack_from(order + offset_fmt, data,
+                                        offset + struct.calcsize(count_fmt) + entries * entry_size)[0]
+    except struct.error:
+        # Truncated header or IFD chain: count what was found (0 for a bare header)
+        pass
+    return pages
+
+
+def sniff_container(head: bytes):
+    """Return '.pdf' / '.tif' if the first bytes of an upload are a PDF or TIFF header, else None."""
+    if head[:5] == b"%PDF-":
+        return ".pdf"
+    if head[:4] in (b"II*\x00", b"MM\x00*", b"II+\x00", b"MM\x00+"):
+        return ".tif"
+    return None
+
+
+def sniff_multipage(data: bytes):
+    """
+    Return '.pdf' / '.tif' if the uploaded bytes are a PDF or a multi-page TIFF,
+    else None (single-page TIFFs are decoded as ordinary images).
+    """
+    container = sniff_container(data)
+    if container == ".tif" and tiff_page_count(data) <= 1:
+        return None
+    return container
+
+
+def page_count(path):
+    path = Path(path)
+    if path.suffix.lower() == ".pdf":
+        _require_pymupdf()
+        with pymupdf.open(str(path)) as doc:
+            return doc.page_count
+    return cv2.imcount(str(path))
+
+
+def iter_pages(path, dpi=DPI):
+    """
+    Lazily yield (page_number, BGR image) for each page, page_number starting at 1.
+    """
+    path = Path(path)
+    if path.suffix.lower() == ".pdf":
+        _require_pymupdf()
+        with pymupdf.open(str(path)) as doc:
+            for page in doc:
+                pix = page.get_pixmap(dpi=dpi, alpha=False)
+                rgb = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+                code = cv2.COLOR_GRAY2BGR if pix.n == 1 else cv2.COLOR_RGB2BGR
+                yield page.number + 1, cv2.cvtColor(rgb, code)
+        return
+
+    count = cv2.imcount(str(path))
+    if count == 0:
+        raise RuntimeError(f"Could not read TIFF: {path}")
+    for i in range(count):
+        ok, mats = cv2.imreadmulti(str(path), start=i, count=1, flags=cv2.IMREAD_COLOR)
+        if not ok or not mats:
+            print(f"Warning: could not decode page {i + 1} of {path}", file=sys.stderr)
+            continue
+        yield i + 1, mats[0]
+
+
+def crop_pages(path, model, dpi=DPI, multi=False, min_area=MIN_AREA, max_overlap=MAX_OVERLAP):
+    """
+    Generator: run the crop pipeline page by page.
+    Yields (page_number, crops, was_cropped) where crops is a list of images.
+    """
+    for page_number, img in iter_pages(path, dpi):
+        if multi:
+            crops, was_cropped = run_crop_all(img, model, min_area, max_overlap)
+        else:
+            cropped, was_cropped = run_crop(img, model)
+            crops = [cropped]
+        yield page_number, crops, was_cropped
+
+
+class PdfAssembler:
+    """
+    Re-assembles cropped pages into a single PDF. Only JPEG-encoded pages are
+    kept until save(), never decoded pixels.
+    """
+
+    def __init__(self, dpi=DPI):
+        _require_pymupdf()
+        self.dpi = dpi
+        self.doc = pymupdf.open()
+
+    @property
+    def page_count(self):
+        return self.doc.page_count
+
+    def add(self, img):
+        h, w = img.shape[:2]
+        data = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY])[1].tobytes()
+        # Keep the physical page size of the rasterized source
+        scale = 72.0 / self.dpi
+        page = self.doc.new_page(width=w * scale, height=h * scale)
+        page.insert_image(page.rect, stream=data)
+
+    def save(self, path):
+        self.doc.save(str(path))
+        self.doc.close()
+
+    def tobytes(self):
+        data = self.doc.tobytes()
+        self.doc.close()
+        return data
+
+
+def page_path(out_file, page_number, n=None):
+    """
+    doc_cropped.pdf -> doc_cropped_p001.jpg (PDF pages are written as JPEG),
+    doc_cropped.tif -> doc_cropped_p001.tif, with an optional _<n> multi-document suffix.
+    """
+    suffix = ".jpg" if out_file.suffix.lower() == ".pdf" else out_file.suffix
+    name = f"{out_file.stem}_p{page_number:03d}"
+    if n is not None:
+        name += f"_{n}"
+    return out_file.with_name(name + suffix)
+
+
+def crop_document_file(in_file, out_file, model, assemble=False, multi=False,
+                       min_area=MIN_AREA, max_overlap=MAX_OVERLAP, dpi=DPI):
+    """
+    Crop a multi-page PDF/TIFF file.
+    With assemble=True all crops go into out_file (forced to .pdf); otherwise each
+    page is written next to it via page_path().
+
+    Returns: (pages, no_detection_pages, written_files)
+    """
+    in_file, out_file = Path(in_file), Path(out_file)
+    assembler = PdfAssembler(dpi) if assemble else None
+    if assemble:
+        out_file = out_file.with_suffix(".pdf")
+
+    pages = 0
+    no_detection = 0
+    written = []
+    for page_number, crops, was_cropped in crop_pages(in_file, model, dpi, multi, min_area, max_overlap):
+        pages += 1
+        no_detection += not was_cropped
+        for i, crop in enumerate(crops, 1):
+            if assembler is not None:
+                assembler.add(crop)
+                continue
+            crop_file = page_path(out_file, page_number, i if multi and was_cropped else None)
+            cv2.imwrite(str(crop_file), crop)
+            written.append(crop_file)
+
+    if assembler is not None and assembler.page_count:
+        assembler.save(out_file)
+        written.append(out_file)
+
+    return pages, no_detection, written
@@ -0,0 +1,373 @@
+"""
+Dedicated inference daemon shared by several HTTP worker processes.
+
+RKNN contexts can't be duplicated across workers, so one daemon process owns
+the model (and the NPU) while the uvicorn workers do decode/encode, multipart
+parsing, MCP JSON handling, preprocess and postprocess on the other cores.
+
+Tensors never go through a pipe: the daemon creates a shared-memory ring of
+SLOTS slots under /dev/shm, each holding one preprocessed input tensor and
+the raw output tensor. Slots are leased per request, never per connection,
+so idle pooled connections can't starve other workers, and leases are granted
+in lane priority order like the NPU itself, so a bulk backlog can't hold every
+slot ahead of interactive requests. A request on a Unix socket connection:
+
+    worker: ("lease", lane)               daemon: ("slot", n) once one is free
+    worker: write input into slot n -> ("infer", n, lane)
+    daemon: run the NPU (in lane priority order) -> write output -> ("done",)
+    worker: postprocess straight from the slot -> ("release", n)
+
+Started by server.run_workers() when CROPPER_WORKERS > 1.
+"""
+import mmap
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+
+from .local_transport import SHM_DIR
+from .npu_inference import NPUInference
+from .scheduler import InferenceScheduler, LANES, INTERACTIVE, HISTORY, wait_percentiles
+
+# Ring size: upper bound on in-flight requests across all workers
+SLOTS = 16
+# Daemon connections a worker process keeps open per lane (its concurrent requests)
+CONNECTIONS_PER_WORKER = 4
+
+INPUT_SHAPE = (1, 640, 640, 3)
+INPUT_DTYPE = np.uint8
+# Only the detection head is shared; the proto masks (outputs[1]) are unused by postprocess
+OUTPUT_SHAPE = (1, 116, 8400)
+OUTPUT_DTYPE = np.float32
+
+INPUT_BYTES = int(np.prod(INPUT_SHAPE)) * np.dtype(INPUT_DTYPE).itemsize
+OUTPUT_BYTES = int(np.prod(OUTPUT_SHAPE)) * np.dtype(OUTPUT_DTYPE).itemsize
+SLOT_BYTES = INPUT_BYTES + OUTPUT_BYTES
+
+
+def slot_views(mm, slot):
+    """(input, output) numpy views of one ring slot."""
+    base = slot * SLOT_BYTES
+    inputs = np.ndarray(INPUT_SHAPE, dtype=INPUT_DTYPE, buffer=mm, offset=base)
+    outputs = np.ndarray(OUTPUT_SHAPE, dtype=OUTPUT_DTYPE, buffer=mm, offset=base + INPUT_BYTES)
+    return inputs, outputs
+
+
+def map_ring(path, slots=None):
+    """Map the ring file; creates it when `slots` is given."""
+    if slots is not None:
+        fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_RDWR, 0o600)
+        os.ftruncate(fd, slots * SLOT_BYTES)
+    else:
+        fd = os.open(path, os.O_RDWR)
+    try:
+        return mmap.mmap(fd, os.fstat(fd).st_size)
+    finally:
+        os.close(fd)
+
+
+# --- Daemon side ---
+class SlotPool:
+    """Ring slots, leased in lane priority order through a capacity-`slots` scheduler."""
+
+    def __init__(self, slots):
+        self.scheduler = InferenceScheduler(None, capacity=slots)
+        self._free = queue.SimpleQueue()
+        for slot in range(slots):
+            self._free.put(slot)
+
+    def lease(self, lane):
+        self.scheduler.acquire(lane)
+        # A granted lease always finds a free slot: slots go back before capacity does
+        return self._free.get_nowait()
+
+    def release(self, slot):
+        self._free.put(slot)
+        self.scheduler.release()
+
+
+def _stats(scheduler, slot_pool):
+    """NPU lane stats plus the per-lane wait for a ring slot (lease_*)."""
+    stats = scheduler.stats()
+    for lane, entry in slot_pool.scheduler.stats()["lanes"].items():
+        stats["lanes"][lane].update({
+            f"lease_{key}": value for key, value in entry.items() if key == "queued" or key.startswith("wait_")
+        })
+    return stats
+
+
+def serve(address, authkey, model_factory, slots=SLOTS, ready=None):
+    """
+    Run the daemon: load the model, create the ring and serve worker connections
+    until SIGTERM. `model_factory` is called once in this process.
+    """
+    # SIGTERM -> SystemExit so the ring and socket get cleaned up
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+    model = model_factory()
+    if model is None:
+        raise SystemExit("Inference daemon: model failed to load")
+    scheduler = InferenceScheduler(model)
+
+    ring_path = SHM_DIR / f"cropper-ring-{os.getpid()}"
+    mm = map_ring(ring_path, slots)
+    slot_pool = SlotPool(slots)
+
+    info = {
+        "ring": str(ring_path),
+        "img_size": model.img_size,
+        "conf_thres": model.conf_thres,
+        "iou_thres": model.iou_thres,
+    }
+
+    if os.path.exists(address):
+        os.unlink(address)
+    listener = Listener(address, family="AF_UNIX", authkey=authkey)
+    print(f"Inference daemon ready: {slots} slots of {SLOT_BYTES // 1024} KB at {ring_path}", file=sys.stderr)
+    if ready is not None:
+        ready.set()
+
+    try:
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception as e:
+                print(f"Inference daemon: rejected connection: {e}", file=sys.stderr)
+                continue
+            threading.Thread(
+                target=_serve_connection,
+                args=(conn, mm, slot_pool, scheduler, info),
+                daemon=True,
+            ).start()
+    finally:
+        listener.close()
+        ring_path.unlink(missing_ok=True)
+        model.release()
+
+
+def _serve_connection(conn, mm, slot_pool, scheduler, info):
+    lanes = {lane: scheduler.lane(lane) for lane in LANES}
+    # Slots this connection currently holds; returned if the worker goes away
+    leased = set()
+    try:
+        conn.send(("hello", info))
+        while True:
+            message = conn.recv()
+            if message[0] == "lease":
+                if message[1] not in LANES:
+                    conn.send(("error", f"Unknown priority {message[1]!r}"))
+                    continue
+                # Waits here, in lane order, while every slot is in use by other requests
+                slot = slot_pool.lease(message[1])
+                leased.add(slot)
+                conn.send(("slot", slot))
+            elif message[0] == "release":
+                # One-way: the worker doesn't wait for an answer
+                if message[1] in leased:
+                    leased.discard(message[1])
+                    slot_pool.release(message[1])
+            elif message[0] == "infer":
+                _, slot, lane = message
+                if slot not in leased:
+                    conn.send(("error", f"Slot {slot} is not leased by this connection"))
+                    continue
+                inputs, outputs = slot_views(mm, slot)
+                try:
+                    result = lanes[lane].infer(inputs)
+                    out = np.asarray(result[0])
+                    if out.shape != OUTPUT_SHAPE:
+                        raise RuntimeError(f"Unexpected model output shape {out.shape}, ring expects {OUTPUT_SHAPE}")
+                    outputs[...] = out
+                    conn.send(("done",))
+                except Exception as e:
+                    conn.send(("error", str(e)))
+                finally:
+                    del inputs, outputs
+            elif message[0] == "stats":
+                conn.send(("stats", _stats(scheduler, slot_pool)))
+            else:
+                conn.send(("error", f"Unknown request {message[0]!r}"))
+    except (EOFError, OSError):
+        # Worker went away
+        pass
+    finally:
+        conn.close()
+        for slot in leased:
+            slot_pool.release(slot)
+
+
+# --- Worker side ---
+class _Channel:
+    """One daemon connection."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def call(self, *message):
+        self.conn.send(message)
+        reply = self.conn.recv()
+        if reply[0] == "error":
+            raise RuntimeError(f"Inference daemon: {reply[1]}")
+        return reply
+
+
+class RemoteInference(NPUInference):
+    """
+    NPUInference stand-in for worker processes: preprocess/postprocess run here,
+    the NPU pass runs in the daemon. Also mirrors the InferenceScheduler
+    interface (lane(), stats()) since the daemon does the scheduling.
+
+    Each lane has its own pool of up to `connections` daemon connections, so
+    bulk requests waiting for a slot never hold the connections interactive
+    requests need. stats() uses a separate control connection, so it never
+    queues behind inference requests either.
+    """
+
+    def __init__(self, address, authkey, connections=CONNECTIONS_PER_WORKER):
+        self.address = address
+        self.authkey = authkey
+        self.max_connections = connections
+        self.mm = None
+
+        self._pools = {lane: queue.LifoQueue() for lane in LANES}
+        self._opened = {lane: 0 for lane in LANES}
+        self._pool_waits = {lane: deque(maxlen=HISTORY) for lane in LANES}
+        self._lock = threading.Lock()
+        self._control = None
+        self._control_lock = threading.Lock()
+
+        # Connect once up front to fail fast and learn the model settings
+        self._opened[INTERACTIVE] = 1
+        self._pools[INTERACTIVE].put(self._connect())
+
+    def _connect(self):
+        conn = Client(self.address, family="AF_UNIX", authkey=self.authkey)
+        _, info = conn.recv()
+        with self._lock:
+            if self.mm is None:
+                self.mm = map_ring(info["ring"])
+                self.img_size = info["img_size"]
+                self.conf_thres = info["conf_thres"]
+                self.iou_thres = info["iou_thres"]
+        return _Channel(conn)
+
+    @contextmanager
+    def _channel(self, lane):
+        pool = self._pools[lane]
+        start = time.monotonic()
+        try:
+            channel = pool.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_open = self._opened[lane] < self.max_connections
+                if can_open:
+                    self._opened[lane] += 1
+            if can_open:
+                try:
+                    channel = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._opened[lane] -= 1
+                    raise
+            else:
+                channel = pool.get()
+        self._pool_waits[lane].append(time.monotonic() - start)
+
+        broken = False
+        try:
+            yield channel
+        except (EOFError, OSError):
+            # Broken connection: drop it, the next request reconnects
+            broken = True
+            channel.conn.close()
+            with self._lock:
+                self._opened[lane] -= 1
+            raise
+        finally:
+            if not broken:
+                pool.put(channel)
+
+    @contextmanager
+    def _infer(self, inputs, lane):
+        """
+        One NPU pass in the daemon: lease a ring slot, run, and yield the output
+        view; the slot goes back to the daemon when the block exits.
+        """
+        with self._channel(lane) as channel:
+            slot = channel.call("lease", lane)[1]
+            try:
+                slot_in, slot_out = slot_views(self.mm, slot)
+                slot_in[...] = inputs
+                channel.call("infer", slot, lane)
+                yield slot_out
+            finally:
+                channel.conn.send(("release", slot))
+
+    def infer(self, inputs, lane=INTERACTIVE):
+        with self._infer(inputs, lane) as outputs:
+            return [outputs.copy()]
+
+    def run(self, img, lane=INTERACTIVE):
+        inputs, ratio, pad = self.preprocess(img)
+        with self._infer(inputs, lane) as outputs:
+            # Postprocess straight from the slot; detections don't keep views into it
+            return self.postprocess([outputs], ratio, pad)
+
+    def lane(self, name):
+        if name not in LANES:
+            raise ValueError(f"Unknown priority '{name}' (expected one of: {', '.join(LANES)})")
+        return RemoteLane(self, name)
+
+    def stats(self):
+        """Daemon stats plus this worker's wait for a daemon connection (pool_*) per lane."""
+        with self._control_lock:
+            if self._control is None:
+                self._control = self._connect()
+            try:
+                stats = self._control.call("stats")[1]
+            except (EOFError, OSError):
+                # Broken connection: the next call reconnects
+                self._control.conn.close()
+                self._control = None
+                raise
+        for lane, waits in self._pool_waits.items():
+            entry = stats["lanes"][lane]
+            entry.update(wait_percentiles(list(waits), "pool_wait"))
+        return stats
+
+    def release(self):
+        for lane, pool in self._pools.items():
+            while True:
+                try:
+                    pool.get_nowait().conn.close()
+                except queue.Empty:
+                    break
+            self._opened[lane] = 0
+        with self._control_lock:
+            if self._control is not None:
+                self._control.conn.close()
+                self._control = None
+
+
+class RemoteLane:
+    """Counterpart of scheduler.LaneModel: run() goes to the daemon in the given lane."""
+
+    def __init__(self, remote, lane):
+        self.remote = remote
+        self.lane = lane
+
+    def __getattr__(self, name):
+        return getattr(self.remote, name)
+
+    def run(self, img):
+        return self.remote.run(img, self.lane)
+
+    def infer(self, inputs):
+        return self.remote.infer(inputs, self.lane)
@@ -0,0 +1,344 @@
+"""
+Load generator for /api/crop and the MCP crop_image tool.
+
+Drives the server at a fixed concurrency (closed loop) or a fixed arrival rate
+(open loop) over keep-alive connections, with a weighted mix of images, and
+reports throughput, latency percentiles, errors and crop-status distribution.
+
+    # Against a board
+    python -m src.loadgen --url http://cropper-mcp.local:3099 --image test/DL1.jpg --image test/DL2.jpg:3 \\
+        --concurrency 8 --duration 60
+
+    # Off-device: start a local server with a stub model (30 ms "NPU") and hammer it
+    python -m src.loadgen --stub-server --stub-latency-ms 30 --image test/ --rate 20 --duration 30
+
+    # MCP streamable-HTTP crop_image: paths are on the server and aren't checked here;
+    # @file reads one path[:weight] per line
+    python -m src.loadgen --target mcp --image /data/scans/a.jpg --image @server_scans.txt --concurrency 4 --requests 500
+"""
+import argparse
+import http.client
+import itertools
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import numpy as np
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".pdf", ".tif", ".tiff"}
+
+
+# "path:weight" - only a numeric suffix is a weight, so other colons stay in the path
+WEIGHTED_SPEC = re.compile(r"(.+?)(?::(\d+(?:\.\d*)?|\.\d+))?")
+
+
+def _expand_specs(specs):
+    for spec in specs:
+        if spec.startswith("@"):
+            lines = Path(spec[1:]).read_text().splitlines()
+            yield from (line.strip() for line in lines if line.strip() and not line.lstrip().startswith("#"))
+        else:
+            yield spec
+
+
+def load_image_mix(specs, local=True):
+    """
+    Parse --image arguments ("path" or "path:weight"; "@list.txt" reads one per line).
+    local=True: paths must exist here and directories expand to their images.
+    local=False (MCP target): paths are on the server and are used as given.
+    Returns a list of (path, weight).
+    """
+    mix = []
+    for spec in _expand_specs(specs):
+        path, weight = WEIGHTED_SPEC.fullmatch(spec).groups()
+        weight = float(weight) if weight else 1.0
+        if not local:
+            mix.append((Path(path), weight))
+            continue
+        path = Path(path).resolve()
+        if path.is_dir():
+            files = sorted(f for f in path.iterdir() if f.suffix.lower() in IMAGE_EXTENSIONS)
+            mix.extend((f, weight) for f in files)
+        elif path.exists():
+            mix.append((path, weight))
+        else:
+            raise SystemExit(f"Image not found: {path}")
+    if not mix:
+        raise SystemExit("No images given (use --image)")
+    return mix
+
+
+class Client:
+    """One keep-alive connection; reconnects after errors."""
+
+    def __init__(self, url, timeout):
+        parts = urlsplit(url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.timeout = timeout
+        self.conn = None
+
+    def request(self, method, path, body, headers):
+        if self.conn is None:
+            self.conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        try:
+            self.conn.request(method, path, body=body, headers=headers)
+            response = self.conn.getresponse()
+            return response.status, response.getheaders(), response.read()
+        except Exception:
+            self.conn.close()
+            self.conn = None
+            raise
+
+
+class ApiTarget:
+    """POST /api/crop with a multipart upload; status from X-Crop-Status."""
+
+    def __init__(self, mix, priority, multi):
+        self.bodies = {}
+        self.boundary = uuid.uuid4().hex
+        for path, _ in mix:
+            data = path.read_bytes()
+            self.bodies[path] = (
+                f"--{self.boundary}\r\n"
+                f'Content-Disposition: form-data; name="file"; filename="{path.name}"\r\n'
+                f"Content-Type: application/octet-stream\r\n\r\n"
+            ).encode() + data + f"\r\n--{self.boundary}--\r\n".encode()
+        self.headers = {"Content-Type": f"multipart/form-data; boundary={self.boundary}"}
+        if priority:
+            self.headers["X-Crop-Priority"] = priority
+        self.path = "/api/crop" + ("?multi=true" if multi else "")
+
+    def send(self, client, image, worker):
+        status, headers, _ = client.request("POST", self.path, self.bodies[image], self.headers)
+        if status != 200:
+            return f"http-{status}"
+        headers = dict((k.lower(), v) for k, v in headers)
+        if "x-crop-status" not in headers and "x-page-count" in headers:
+            # Streamed PDF/TIFF tar: per-page results aren't known when headers are sent
+            return "streamed"
+        return headers.get("x-crop-status", "unknown")
+
+
+class McpTarget:
+    """Stateless streamable-HTTP tools/call crop_image; status from the result text."""
+
+    def __init__(self, priority, multi, output_dir):
+        self.priority = priority
+        self.multi = multi
+        self.output_dir = Path(output_dir)
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.ids = itertools.count(1)
+        self.headers = {"Content-Type": "application/json", "Accept": "application/json, text/event-stream"}
+
+    def send(self, client, image, worker):
+        arguments = {
+            "input_path": str(image),
+            # One output file per worker, overwritten each time
+            "output_path": str(self.output_dir / f"worker{worker}{image.suffix}"),
+        }
+        if self.priority:
+            arguments["priority"] = self.priority
+        if self.multi:
+            arguments["multi"] = True
+        payload = {
+            "jsonrpc": "2.0",
+            "id": next(self.ids),
+            "method": "tools/call",
+            "params": {"name": "crop_image", "arguments": arguments},
+        }
+        status, _, body = client.request("POST", "/mcp/", json.dumps(payload).encode(), self.headers)
+        if status != 200:
+            return f"http-{status}"
+
+        message = json.loads(body)
+        if "error" in message:
+            return "rpc-error"
+        text = message["result"]["content"][0]["text"]
+        if text.startswith("Success"):
+            return "cropped"
+        if text.startswith("Warning"):
+            return "no-detection"
+        return "tool-error"
+
+
+# Statuses that count as a successful request
+OK_STATUSES = {"cropped", "no-detection", "streamed"}
+
+
+class LoadRun:
+    def __init__(self, target, url, mix, concurrency, rate=None, duration=None, requests=None,
+                 timeout=60.0, seed=0):
+        self.target = target
+        self.url = url
+        self.images = [path for path, _ in mix]
+        self.weights = [weight for _, weight in mix]
+        self.concurrency = concurrency
+        self.rate = rate
+        self.duration = duration
+        self.max_requests = requests
+        self.timeout = timeout
+        self.random = random.Random(seed)
+
+        self._lock = threading.Lock()
+        self._issued = 0
+        self.latencies = []
+        self.statuses = Counter()
+        self.errors = Counter()
+
+    def _next_request(self, start):
+        """Pick the next image and its intended send time, or None when the run is over."""
+        with self._lock:
+            if self.max_requests is not None and self._issued >= self.max_requests:
+                return None
+            index = self._issued
+            self._issued += 1
+            image = self.random.choices(self.images, self.weights)[0]
+        scheduled = start + index / self.rate if self.rate else time.monotonic()
+        if self.duration is not None and scheduled - start >= self.duration:
+            return None
+        return image, scheduled
+
+    def _worker(self, worker, start):
+        client = Client(self.url, self.timeout)
+        while True:
+            item = self._next_request(start)
+            if item is None:
+                return
+            image, scheduled = item
+            delay = scheduled - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+            # Latency from the intended send time, so queueing behind a slow server
+            # is not hidden when running at a fixed rate (coordinated omission)
+            try:
+                status = self.target.send(client, image, worker)
+                error = None if status in OK_STATUSES else status
+            except Exception as e:
+                status = "exception"
+                error = type(e).__name__
+            latency = time.monotonic() - scheduled
+
+            with self._lock:
+                self.latencies.append(latency)
+                self.statuses[status] += 1
+                if error:
+                    self.errors[error] += 1
+
+    def run(self):
+        start = time.monotonic()
+        threads = [threading.Thread(target=self._worker, args=(i, start), daemon=True) for i in range(self.concurrency)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.elapsed = time.monotonic() - start
+        return self
+
+    def report(self):
+        total = len(self.latencies)
+        lines = [f"Requests: {total} in {self.elapsed:.1f}s ({total / self.elapsed:.1f} req/s)"]
+        if total:
+            ms = np.asarray(self.latencies) * 1000
+            lines.append(
+                f"Latency ms: p50 {np.percentile(ms, 50):.1f} | p95 {np.percentile(ms, 95):.1f} | "
+                f"p99 {np.percentile(ms, 99):.1f} | max {ms.max():.1f} | mean {ms.mean():.1f}"
+            )
+            error_count = sum(self.errors.values())
+            lines.append(f"Errors: {error_count} ({100.0 * error_count / total:.1f}%)"
+                         + (f" - {dict(self.errors)}" if error_count else ""))
+            lines.append("Status: " + ", ".join(f"{k}={v}" for k, v in self.statuses.most_common()))
+        return "\n".join(lines)
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_stub_server(latency_ms, timeout=60.0):
+    """Start `python -m src.server` on a free port with the stub model. Returns (process, url)."""
+    port = _free_port()
+    env = dict(os.environ, CROPPER_STUB_LATENCY_MS=str(latency_ms), CROPPER_PORT=str(port))
+    project_dir = Path(__file__).resolve().parent.parent
+    process = subprocess.Popen([sys.executable, "-m", "src.server"], cwd=project_dir, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit("Stub server exited during startup")
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return process, f"http://127.0.0.1:{port}"
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit("Stub server did not start in time")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load generator for /api/crop and the MCP crop_image tool.")
+    parser.add_argument("--url", default="http://cropper-mcp.local:3099", help="Server base URL")
+    parser.add_argument("--target", choices=["api", "mcp"], default="api")
+    parser.add_argument("--image", action="append", default=[],
+                        help="Image file or directory, optionally weighted as path:weight, or @file with one "
+                             "per line (repeatable). For --target mcp these are server-side paths.")
+    parser.add_argument("--concurrency", type=int, default=4, help="Parallel keep-alive connections")
+    parser.add_argument("--rate", type=float, help="Open-loop arrival rate in requests/s (default: closed loop)")
+    parser.add_argument("--duration", type=float, help="Run for N seconds")
+    parser.add_argument("--requests", type=int, help="Stop after N requests")
+    parser.add_argument("--priority", choices=["interactive", "bulk"], help="Scheduling lane to declare")
+    parser.add_argument("--multi", action="store_true", help="Request multi-document extraction")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the image mix")
+    parser.add_argument("--mcp-output-dir", default=os.path.join(tempfile.gettempdir(), "cropper-loadgen"),
+                        help="Where crop_image writes results for --target mcp (must exist on the server)")
+    parser.add_argument("--stub-server", action="store_true",
+                        help="Start a local server with a stub model and test against it")
+    parser.add_argument("--stub-latency-ms", type=float, default=30.0, help="Stub model inference latency")
+    args = parser.parse_args(argv)
+
+    if args.duration is None and args.requests is None:
+        args.duration = 30.0
+
+    mix = load_image_mix(args.image, local=args.target == "api")
+    if args.target == "api":
+        target = ApiTarget(mix, args.priority, args.multi)
+    else:
+        target = McpTarget(args.priority, args.multi, args.mcp_output_dir)
+
+    process = None
+    url = args.url
+    if args.stub_server:
+        process, url = start_stub_server(args.stub_latency_ms)
+        print(f"Stub server ({args.stub_latency_ms:g} ms inference) at {url}")
+
+    try:
+        mode = f"rate {args.rate:g}/s" if args.rate else "closed loop"
+        print(f"Target {args.target} @ {url}: {len(mix)} image(s), concurrency {args.concurrency}, {mode}")
+        run = LoadRun(target, url, mix, args.concurrency, args.rate, args.duration, args.requests,
+                      args.timeout, args.seed).run()
+        print(run.report())
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
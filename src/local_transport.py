@@ -0,0 +1,227 @@
+"""
+Zero-copy local transport for same-host clients.
+
+Instead of uploading the image through multipart HTTP, a local process puts
+the pixels (raw BGR or an encoded JPEG/PNG) into a POSIX shared-memory
+segment or any mmap-able file (/dev/shm/..., a memfd via /proc/<pid>/fd/<n>)
+and sends only a small JSON descriptor. The server maps the buffer, crops it
+in place and returns the box - optionally writing the crop back into the
+same buffer.
+
+Only reachable over the Unix domain socket listener: the peer's credentials
+(SO_PEERCRED) decide which buffers it may name, so a client can never make
+the server read or write a file the client couldn't touch itself.
+"""
+import mmap
+import os
+import re
+import socket
+import stat
+import struct
+from collections import namedtuple
+from pathlib import Path
+
+import cv2
+import numpy as np
+from uvicorn.protocols.http.auto import AutoHTTPProtocol
+
+from .cropping import find_crop_box, select_documents, MIN_AREA, MAX_OVERLAP
+
+SHM_DIR = Path("/dev/shm")
+# A memfd (or any open file) handed over as /proc/<pid>/fd/<n>
+PROC_FD = re.compile(r"/proc/(\d+)/fd/(\d+)")
+# Write-back quality for encoded input, lowered step by step if the crop doesn't fit
+JPEG_QUALITY = 90
+MIN_JPEG_QUALITY = 50
+
+PeerCredentials = namedtuple("PeerCredentials", "pid uid gid")
+
+
+def peer_credentials(sock):
+    """SO_PEERCRED of a connected Unix socket, or None for any other socket."""
+    if sock is None or sock.family != socket.AF_UNIX:
+        return None
+    data = sock.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize("3i"))
+    return PeerCredentials(*struct.unpack("3i", data))
+
+
+class PeerCredHTTPProtocol(AutoHTTPProtocol):
+    """
+    uvicorn HTTP protocol that puts the Unix-socket peer's credentials into each
+    request's scope (scope["extensions"]["peer_cred"]). TCP connections get none.
+    """
+
+    def connection_made(self, transport):
+        super().connection_made(transport)
+        creds = peer_credentials(transport.get_extra_info("socket"))
+        if creds is None:
+            return
+        app = self.app
+
+        async def app_with_creds(scope, receive, send):
+            scope.setdefault("extensions", {})["peer_cred"] = creds
+            await app(scope, receive, send)
+
+        self.app = app_with_creds
+
+
+def local_peer(request):
+    """Credentials of a Unix-socket client, or None (TCP, even from loopback, is not trusted)."""
+    return request.scope.get("extensions", {}).get("peer_cred")
+
+
+def buffer_path(spec, peer, local_dir=None):
+    """
+    Resolve the descriptor's "shm" (POSIX shared-memory name) or "path" to a file path.
+    Paths must lie in /dev/shm or `local_dir`, or be one of the peer's own /proc/<pid>/fd/<n>.
+    """
+    if spec.get("shm"):
+        name = str(spec["shm"]).lstrip("/")
+        if not name or "/" in name or name in (".", ".."):
+            raise ValueError(f"Invalid shared-memory name: {spec['shm']}")
+        return SHM_DIR / name
+    if not spec.get("path"):
+        raise ValueError('Descriptor needs "shm" or "path"')
+
+    path = str(spec["path"])
+    match = PROC_FD.fullmatch(path)
+    if match:
+        if int(match.group(1)) != peer.pid:
+            raise PermissionError("Only the caller's own file descriptors can be passed")
+        return Path(path)
+
+    resolved = Path(os.path.realpath(path))
+    allowed = [SHM_DIR] + ([Path(os.path.realpath(local_dir))] if local_dir else [])
+    if not any(resolved.parent == d or d in resolved.parents for d in allowed):
+        raise PermissionError(f"Buffers must be in {' or '.join(str(d) for d in allowed)} or /proc/<pid>/fd")
+    return resolved
+
+
+def open_buffer(path, peer, write):
+    """Open a buffer file on behalf of `peer`: regular files it owns only (root may use any)."""
+    flags = os.O_RDWR if write else os.O_RDONLY
+    if not PROC_FD.fullmatch(str(path)):
+        # /proc/<pid>/fd entries are symlinks by design; anything else must not be swapped for one
+        flags |= os.O_NOFOLLOW
+    fd = os.open(path, flags)
+    try:
+        st = os.fstat(fd)
+        if not stat.S_ISREG(st.st_mode):
+            raise ValueError(f"Not a regular file: {path}")
+        if peer.uid != 0 and st.st_uid != peer.uid:
+            raise PermissionError(f"Buffer is not owned by the calling user: {path}")
+    except BaseException:
+        os.close(fd)
+        raise
+    return fd
+
+
+def crop_buffer(spec, model, peer, local_dir=None):
+    """
+    Crop the image described by `spec` directly from its buffer, on behalf of the
+    Unix-socket client `peer` (see peer_credentials).
+
+    spec keys:
+        shm / path: Buffer location (see buffer_path).
+        offset: Byte offset of the image in the buffer (default 0).
+        shape: [h, w] or [h, w, 3] for raw uint8 BGR pixels, or
+        size: Byte length of an encoded image (default: rest of the buffer).
+        multi, min_area, max_overlap: Return every detected document (boxes only).
+        write: Write the crop back into the buffer at `offset` - raw pixels for
+               raw input (shape returned), JPEG for encoded input (size returned).
+        quality: JPEG quality for write with encoded input (default 90; lowered
+                 automatically down to 50 if the crop would not fit).
+
+    Returns: JSON-able dict with status, box (or boxes) and, for write, the new shape/size.
+    """
+    path = buffer_path(spec, peer, local_dir)
+    write = bool(spec.get("write"))
+    offset = int(spec.get("offset", 0))
+
+    fd = open_buffer(path, peer, write)
+    try:
+        length = os.fstat(fd).st_size
+        if not 0 <= offset < length:
+            raise ValueError(f"offset {offset} is outside the {length}-byte buffer")
+        mm = mmap.mmap(fd, length, access=mmap.ACCESS_WRITE if write else mmap.ACCESS_READ)
+    finally:
+        # The mapping keeps its own reference to the file
+        os.close(fd)
+
+    try:
+        return _crop_mapped(mm, spec, model, offset, write)
+    finally:
+        try:
+            mm.close()
+        except BufferError:
+            # An in-flight exception still references a view; GC unmaps it later
+            pass
+
+
+def _crop_mapped(mm, spec, model, offset, write):
+    # NOTE: every numpy view into mm must be gone when this returns, or mm.close() fails
+    raw = spec.get("shape") is not None
+    if raw:
+        shape = tuple(int(d) for d in spec["shape"])
+        if len(shape) not in (2, 3) or min(shape) <= 0 or (len(shape) == 3 and shape[2] not in (1, 3)):
+            raise ValueError("shape must be [h, w] or [h, w, 3] (uint8 BGR)")
+        if offset + int(np.prod(shape)) > len(mm):
+            raise ValueError(f"shape {list(shape)} at offset {offset} does not fit in the {len(mm)}-byte buffer")
+        img = np.ndarray(shape, dtype=np.uint8, buffer=mm, offset=offset)
+        if img.ndim == 3 and img.shape[2] == 1:
+            img = img[:, :, 0]
+        if img.ndim == 2:
+            img = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
+    else:
+        size = int(spec.get("size") or (len(mm) - offset))
+        if size <= 0 or offset + size > len(mm):
+            raise ValueError(f"size {size} at offset {offset} does not fit in the {len(mm)}-byte buffer")
+        encoded = np.frombuffer(mm, dtype=np.uint8, count=size, offset=offset)
+        img = cv2.imdecode(encoded, cv2.IMREAD_COLOR)
+        del encoded
+        if img is None:
+            raise ValueError("Buffer does not contain a decodable image")
+
+    if spec.get("multi"):
+        results = model.run(img)
+        min_area = float(spec.get("min_area", MIN_AREA))
+        max_overlap = float(spec.get("max_overlap", MAX_OVERLAP))
+        boxes = select_documents(results, img.shape, min_area, max_overlap) if results else []
+        return {
+            "status": "cropped" if boxes else "no-detection",
+            "boxes": [list(b) for b in boxes],
+            "shape": list(img.shape),
+        }
+
+    box = find_crop_box(img, model)
+    response = {
+        "status": "cropped" if box is not None else "no-detection",
+        "box": list(box) if box is not None else None,
+        "shape": list(img.shape),
+    }
+    if not write or box is None:
+        return response
+
+    x1, y1, x2, y2 = box
+    # Copy first: source and destination overlap in the same buffer
+    crop = img[y1:y2, x1:x2].copy()
+    del img
+
+    if raw:
+        if len(spec["shape"]) == 2 or int(spec["shape"][2]) == 1:
+            crop = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+        mm[offset:offset + crop.nbytes] = crop.tobytes()
+        response["written_shape"] = list(crop.shape)
+    else:
+        room = len(mm) - offset
+        quality = int(spec.get("quality", JPEG_QUALITY))
+        data = cv2.imencode('.jpg', crop, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+        while len(data) > room and quality > MIN_JPEG_QUALITY:
+            quality = max(quality - 10, MIN_JPEG_QUALITY)
+            data = cv2.imencode('.jpg', crop, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes()
+        if len(data) > room:
+            raise ValueError(f"Encoded crop ({len(data)} bytes at quality {quality}) does not fit in the buffer")
+        mm[offset:offset + len(data)] = data
+        response["written_size"] = len(data)
+        response["written_quality"] = quality
+    return response
@@ -1,9 +1,16 @@
 import numpy as np
 import cv2
-from rknnlite.api import RKNNLite
+try:
+    from rknnlite.api import RKNNLite
+except ImportError:
+    # Only available on Rockchip boards. preprocess/postprocess stay usable
+    # elsewhere (e.g. by the replay backend in replay_inference.py).
+    RKNNLite = None
 
 class NPUInference:
     def __init__(self, model_path, npu_id=0):
+        if RKNNLite is None:
+            raise RuntimeError("rknnlite is not installed - NPU inference requires a Rockchip board")
         self.rknn = RKNNLite()
         
         # Load RKNN model
@@ -134,9 +141,13 @@ class NPUInference:
                 
         return results
 
+    def infer(self, inputs):
+        """Run the raw NPU pass on a preprocessed (1, 640, 640, 3) tensor."""
+        return self.rknn.inference(inputs=[inputs])
+
     def run(self, img):
         inputs, ratio, pad = self.preprocess(img)
-        outputs = self.rknn.inference(inputs=[inputs])
+        outputs = self.infer(inputs)
         detections = self.postprocess(outputs, ratio, pad)
         return detections
 
@@ -0,0 +1,185 @@
+"""
+On-demand profiling of the crop paths.
+
+Two modes, enabled for N seconds and/or N requests:
+- "deterministic": cProfile around each crop request (decode, preprocess,
+  inference, postprocess, encode). Reported as pstats text.
+- "sampling": a background thread samples every thread's stack (including
+  the event loop, so MCP/HTTP transport time shows up too). Reported as
+  collapsed stacks, ready for flamegraph.pl / speedscope.
+
+When no session is running the only cost per request is one attribute check.
+"""
+import cProfile
+import io
+import pstats
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+DETERMINISTIC = "deterministic"
+SAMPLING = "sampling"
+MODES = (DETERMINISTIC, SAMPLING)
+
+# Hard cap so a forgotten session can't run forever
+MAX_SECONDS = 300
+SAMPLE_INTERVAL = 0.005
+# Sort keys pstats accepts (SortKey values plus the legacy aliases like tottime)
+SORT_KEYS = tuple(pstats.Stats.sort_arg_dict_default)
+
+
+def check_sort(sort):
+    """Reject an unknown pstats sort key up front, not after the session ran."""
+    if sort not in SORT_KEYS:
+        raise ValueError(f"Unknown sort key '{sort}' (expected one of: {', '.join(sorted(SORT_KEYS))})")
+
+
+class CropProfiler:
+    def __init__(self):
+        self.active = False
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._done.set()
+
+        self.mode = None
+        self._deadline = None
+        self._max_requests = None
+        self._requests = 0
+        self._started = None
+        self._elapsed = 0.0
+        self._stats = None
+        self._skipped = 0
+        self._samples = Counter()
+        self._sampler = None
+
+    def start(self, seconds=None, requests=None, mode=DETERMINISTIC):
+        """
+        Begin a profiling session. Ends after `seconds`, after `requests` crop
+        requests, or after MAX_SECONDS, whichever comes first.
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown profiler mode '{mode}' (expected one of: {', '.join(MODES)})")
+        seconds = min(seconds or MAX_SECONDS, MAX_SECONDS)
+
+        with self._lock:
+            if self.active:
+                raise RuntimeError("A profiling session is already running")
+            self.mode = mode
+            self._started = time.monotonic()
+            self._deadline = self._started + seconds
+            self._max_requests = requests or None
+            self._requests = 0
+            self._elapsed = 0.0
+            self._stats = None
+            self._skipped = 0
+            self._samples = Counter()
+            self._sampler = None
+            if mode == SAMPLING:
+                self._sampler = threading.Thread(target=self._sample_loop, name="crop-profiler", daemon=True)
+            self._done.clear()
+            self.active = True
+            if self._sampler is not None:
+                # Started under the lock so stop() never sees an unstarted thread
+                self._sampler.start()
+
+    def stop(self):
+        with self._lock:
+            if self.active:
+                self.active = False
+                self._elapsed = time.monotonic() - self._started
+                self._done.set()
+            sampler = self._sampler
+
+        # Outside the lock: let the sampler finish its last pass before anyone reads
+        # the samples or a new session starts (it calls stop() itself when it expires)
+        if sampler is not None and sampler is not threading.current_thread():
+            sampler.join()
+
+    def finished(self):
+        """True once the session hit its time or request limit (stopping it if needed)."""
+        if self.active and time.monotonic() >= self._deadline:
+            self.stop()
+        return self._done.is_set()
+
+    def call(self, fn, *args, **kwargs):
+        """Run one crop request, profiling it if a session is active."""
+        if not self.active:
+            return fn(*args, **kwargs)
+
+        if self.mode == SAMPLING:
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self._count_request(None)
+
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+ allows only one active cProfile; concurrent requests go unprofiled
+            with self._lock:
+                self._skipped += 1
+            return fn(*args, **kwargs)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profile.disable()
+            self._count_request(profile)
+
+    def _count_request(self, profile):
+        with self._lock:
+            if not self.active:
+                return
+            if profile is not None:
+                if self._stats is None:
+                    self._stats = pstats.Stats(profile)
+                else:
+                    self._stats.add(profile)
+            self._requests += 1
+            limit_hit = self._max_requests is not None and self._requests >= self._max_requests
+        if limit_hit or time.monotonic() >= self._deadline:
+            self.stop()
+
+    def _sample_loop(self):
+        own = threading.get_ident()
+        # This session's counter; start() replaces self._samples for the next one
+        samples = self._samples
+        while self.active and time.monotonic() < self._deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{Path(code.co_filename).name}:{code.co_name}")
+                    frame = frame.f_back
+                samples[";".join(reversed(stack))] += 1
+            time.sleep(SAMPLE_INTERVAL)
+        self.stop()
+
+    def report(self, sort="cumulative", limit=40):
+        """Text report of the last finished session."""
+        check_sort(sort)
+        with self._lock:
+            header = (
+                f"# mode={self.mode} requests={self._requests} "
+                f"elapsed={self._elapsed or (time.monotonic() - (self._started or time.monotonic())):.1f}s"
+            )
+            if self._skipped:
+                header += f" skipped={self._skipped} (concurrent with another profiled request)"
+
+            if self.mode == SAMPLING:
+                lines = [f"{stack} {count}" for stack, count in self._samples.most_common()]
+                return header + "\n" + ("\n".join(lines) if lines else "(no samples)")
+
+            if self._stats is None:
+                return header + "\n(no crop requests were profiled)"
+            out = io.StringIO()
+            self._stats.stream = out
+            self._stats.sort_stats(sort).print_stats(limit)
+            return header + "\n" + out.getvalue()
+
+
+profiler = CropProfiler()
@@ -0,0 +1,316 @@
+"""
+Record/replay backends for off-device testing.
+
+RecordingInference wraps a live NPUInference and dumps every pass
+(preprocessed input, raw RKNN output tensors, letterbox params and the
+detections postprocess produced) to a compressed .npz file.
+
+ReplayInference feeds those captures back through postprocess/run_crop on
+any Linux machine - no rknnlite or NPU needed. Run it as a regression and
+profiling harness:
+
+    python -m src.replay_inference /path/to/captures [--repeat N] [--profile]
+"""
+import argparse
+import itertools
+import queue
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from .cropping import run_crop
+from .npu_inference import NPUInference
+
+
+class Capture:
+    """One recorded inference pass, as loaded from a .npz file."""
+
+    def __init__(self, path, data):
+        self.path = Path(path)
+        self.inputs = data["inputs"]
+        output_keys = sorted((k for k in data.files if k.startswith("output_")), key=lambda k: int(k[7:]))
+        self.outputs = [data[k] for k in output_keys]
+        self.ratio = float(data["ratio"])
+        self.pad = tuple(float(p) for p in data["pad"])
+        self.image_shape = tuple(int(d) for d in data["image_shape"])
+        self.conf_thres = float(data["conf_thres"])
+        self.iou_thres = float(data["iou_thres"])
+        self.det_boxes = data["det_boxes"]
+        self.det_scores = data["det_scores"]
+        self.det_classes = data["det_classes"]
+        self._image = data["image"] if "image" in data.files else None
+
+    @property
+    def has_image(self):
+        return self._image is not None
+
+    def image(self):
+        """
+        The original image if it was recorded, otherwise a blank image of the
+        same shape (box maths and crop geometry are identical either way).
+        """
+        if self._image is not None:
+            return self._image
+        return np.zeros(self.image_shape, dtype=np.uint8)
+
+    def matches(self, detections):
+        """Bit-exact comparison of postprocess output against the recorded detections."""
+        boxes, scores, classes = _pack_detections(detections)
+        return (
+            np.array_equal(boxes, self.det_boxes)
+            and np.array_equal(scores, self.det_scores)
+            and np.array_equal(classes, self.det_classes)
+        )
+
+
+def _pack_detections(detections):
+    if not detections:
+        return np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.int64)
+    boxes = np.stack([np.asarray(d['box']) for d in detections])
+    scores = np.array([d['score'] for d in detections])
+    classes = np.array([d['class_id'] for d in detections])
+    return boxes, scores, classes
+
+
+# Captures waiting to be compressed; passes beyond this are dropped, not queued
+RECORD_QUEUE = 32
+
+
+class RecordingInference:
+    """
+    Transparent wrapper around an NPUInference that records every pass.
+    Captures are compressed and written by a background thread, so recording
+    doesn't extend the request (or the scheduler slot it holds).
+    Recording failures are logged and never break the crop itself.
+    """
+
+    def __init__(self, model, record_dir, save_image=False, max_pending=RECORD_QUEUE):
+        self.model = model
+        self.record_dir = Path(record_dir)
+        self.record_dir.mkdir(parents=True, exist_ok=True)
+        self.save_image = save_image
+        self._session = time.strftime("%Y%m%d-%H%M%S")
+        self._counter = itertools.count()
+        self._dropped = 0
+        self._pending = queue.Queue(maxsize=max_pending)
+        self._writer = threading.Thread(target=self._write_loop, name="capture-writer", daemon=True)
+        self._writer.start()
+
+    def __getattr__(self, name):
+        # Thresholds, preprocess/postprocess, etc. come from the wrapped model
+        return getattr(self.model, name)
+
+    def run(self, img):
+        inputs, ratio, pad = self.model.preprocess(img)
+        outputs = self.model.infer(inputs)
+        detections = self.model.postprocess(outputs, ratio, pad)
+        # The image may be a view into a caller's buffer (local transport); keep our own copy
+        image = img.copy() if self.save_image else None
+        try:
+            self._pending.put_nowait((next(self._counter), img.shape, image, inputs, outputs, ratio, pad, detections))
+        except queue.Full:
+            self._dropped += 1
+            if self._dropped == 1 or self._dropped % 100 == 0:
+                print(f"Warning: capture writer is behind, {self._dropped} inference pass(es) not recorded", file=sys.stderr)
+        return detections
+
+    def _write_loop(self):
+        while True:
+            item = self._pending.get()
+            try:
+                if item is None:
+                    return
+                self._save(*item)
+            except Exception as e:
+                print(f"Warning: failed to record inference capture: {e}", file=sys.stderr)
+            finally:
+                self._pending.task_done()
+
+    def _save(self, index, image_shape, img, inputs, outputs, ratio, pad, detections):
+        path = self.record_dir / f"{self._session}_{index:06d}.npz"
+
+        boxes, scores, classes = _pack_detections(detections)
+        arrays = {
+            "inputs": inputs,
+            "ratio": np.float64(ratio),
+            "pad": np.asarray(pad, dtype=np.float64),
+            "image_shape": np.asarray(image_shape),
+            "conf_thres": np.float64(self.model.conf_thres),
+            "iou_thres": np.float64(self.model.iou_thres),
+            "det_boxes": boxes,
+            "det_scores": scores,
+            "det_classes": classes,
+        }
+        for i, out in enumerate(outputs):
+            arrays[f"output_{i}"] = out
+        if img is not None:
+            arrays["image"] = img
+
+        np.savez_compressed(path, **arrays)
+
+    def flush(self):
+        """Block until every queued capture has been written."""
+        self._pending.join()
+
+    def release(self):
+        # Finish writing what was recorded before the model goes away
+        self._pending.put(None)
+        self._writer.join()
+        self.model.release()
+
+
+class ReplayInference(NPUInference):
+    """
+    Drop-in NPUInference replacement backed by recorded captures.
+    Each run() consumes the next capture (cycling when loop=True) and ignores
+    the pixels it is given, so it can stand in for the NPU behind the server.
+    """
+
+    def __init__(self, capture_dir, loop=True):
+        self.capture_paths = sorted(Path(capture_dir).glob("*.npz"))
+        if not self.capture_paths:
+            raise RuntimeError(f"No captures (*.npz) found in {capture_dir}")
+
+        first = self.load(self.capture_paths[0])
+        self.img_size = 640
+        self.conf_thres = first.conf_thres
+        self.iou_thres = first.iou_thres
+
+        self._paths = itertools.cycle(self.capture_paths) if loop else iter(self.capture_paths)
+        self._selected = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def load(path):
+        with np.load(path) as data:
+            return Capture(path, data)
+
+    def captures(self):
+        """Yield every capture in recording order."""
+        for path in self.capture_paths:
+            yield self.load(path)
+
+    def select(self, capture):
+        """Pin the capture the next run() call will replay."""
+        self._selected = capture
+
+    def _take(self):
+        with self._lock:
+            if self._selected is not None:
+                capture, self._selected = self._selected, None
+                return capture
+            path = next(self._paths, None)
+        if path is None:
+            raise RuntimeError("Replay captures exhausted")
+        return self.load(path)
+
+    def infer(self, inputs):
+        return self._take().outputs
+
+    def run(self, img):
+        capture = self._take()
+        return self.postprocess(capture.outputs, capture.ratio, capture.pad)
+
+    def release(self):
+        pass
+
+
+class StubInference(NPUInference):
+    """
+    Synthetic backend for capacity planning without a board: real preprocess and
+    postprocess, but infer() sleeps for `latency` seconds and reports one document
+    covering the central 80% of the letterboxed input.
+    """
+
+    def __init__(self, latency=0.03):
+        self.img_size = 640
+        self.conf_thres = 0.10
+        self.iou_thres = 0.45
+        self.latency = latency
+
+        # (1, 116, 8400): cx, cy, w, h, 80 class scores, 32 mask coeffs
+        self._outputs = [np.zeros((1, 116, 8400), dtype=np.float32), np.zeros((1, 32, 160, 160), dtype=np.float32)]
+        size = self.img_size
+        self._outputs[0][0, :4, 0] = (size / 2, size / 2, size * 0.8, size * 0.8)
+        self._outputs[0][0, 4 + 73, 0] = 0.9  # Book
+
+    def infer(self, inputs):
+        time.sleep(self.latency)
+        return self._outputs
+
+    def release(self):
+        pass
+
+
+def replay(capture_dir, repeat=1):
+    """
+    Replay every capture through postprocess and run_crop.
+    Returns (mismatched capture paths, postprocess times, run_crop times) in seconds.
+    """
+    model = ReplayInference(capture_dir, loop=False)
+    mismatches = []
+    post_times = []
+    crop_times = []
+
+    for capture in model.captures():
+        model.conf_thres = capture.conf_thres
+        model.iou_thres = capture.iou_thres
+        img = capture.image()
+
+        for _ in range(repeat):
+            t0 = time.perf_counter()
+            detections = model.postprocess(capture.outputs, capture.ratio, capture.pad)
+            post_times.append(time.perf_counter() - t0)
+
+            model.select(capture)
+            t0 = time.perf_counter()
+            run_crop(img, model)
+            crop_times.append(time.perf_counter() - t0)
+
+        if not capture.matches(detections):
+            mismatches.append(capture.path)
+
+    return mismatches, post_times, crop_times
+
+
+def _summarize(label, times):
+    ms = np.asarray(times) * 1000
+    return f"{label}: mean {ms.mean():.2f} ms, p50 {np.percentile(ms, 50):.2f} ms, p95 {np.percentile(ms, 95):.2f} ms, max {ms.max():.2f} ms"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded NPU captures through postprocess/run_crop.")
+    parser.add_argument("capture_dir", help="Directory of .npz captures written by RecordingInference")
+    parser.add_argument("--repeat", type=int, default=1, help="Replay each capture N times (for stable timings)")
+    parser.add_argument("--profile", action="store_true", help="Run under cProfile and print the hottest functions")
+    args = parser.parse_args(argv)
+
+    if args.profile:
+        import cProfile
+        import pstats
+        profiler = cProfile.Profile()
+        profiler.enable()
+        mismatches, post_times, crop_times = replay(args.capture_dir, args.repeat)
+        profiler.disable()
+        pstats.Stats(profiler, stream=sys.stdout).sort_stats("cumulative").print_stats(25)
+    else:
+        mismatches, post_times, crop_times = replay(args.capture_dir, args.repeat)
+
+    print(f"Replayed {len(post_times) // args.repeat} captures x{args.repeat}")
+    print(_summarize("postprocess", post_times))
+    print(_summarize("run_crop", crop_times))
+
+    if mismatches:
+        print(f"MISMATCH: {len(mismatches)} capture(s) differ from recorded detections:")
+        for path in mismatches:
+            print(f"  {path}")
+        return 1
+    print("All detections match recorded output bit-for-bit.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,167 @@
+"""
+Priority scheduler in front of the single model instance.
+
+Every inference call declares a lane ("interactive" or "bulk"). When the model
+is free, the next caller is picked by weighted fair sharing across lanes, so a
+large crop_batch can't starve /api/crop calls from the scanning UI. Aging
+guarantees bulk work still progresses: a lane that has had waiters but no
+slot for AGING seconds is served next regardless of lane weights. Aging is per
+lane, not per waiter, so a deep bulk backlog still gets only the occasional
+aged slot instead of turning the order into FIFO.
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+# Lane weights: interactive gets ~8 slots for every bulk slot under contention
+LANES = {INTERACTIVE: 8, BULK: 1}
+# Seconds a lane can wait without being served before it jumps the weighted order
+AGING = 2.0
+# Number of recent wait times kept per lane for the percentiles
+HISTORY = 1000
+
+
+def wait_percentiles(waits, prefix="wait"):
+    """p50/p95/p99/max of wait times in seconds, as {prefix_p50_ms: ...} (empty without data)."""
+    if not waits:
+        return {}
+    ms = np.asarray(waits) * 1000
+    return {
+        f"{prefix}_p50_ms": round(float(np.percentile(ms, 50)), 2),
+        f"{prefix}_p95_ms": round(float(np.percentile(ms, 95)), 2),
+        f"{prefix}_p99_ms": round(float(np.percentile(ms, 99)), 2),
+        f"{prefix}_max_ms": round(float(ms.max()), 2),
+    }
+
+
+class InferenceScheduler:
+    """
+    Grants `capacity` concurrent slots (1 = exclusive use of the model) in lane
+    priority order. The inference daemon also uses one to hand out ring slots.
+    """
+
+    def __init__(self, model, weights=LANES, aging=AGING, history=HISTORY, capacity=1):
+        self.model = model
+        self.weights = dict(weights)
+        self.aging = aging
+        self.capacity = capacity
+
+        self._cond = threading.Condition()
+        self._in_use = 0
+        self._queues = {lane: deque() for lane in self.weights}
+        # Weighted-fair virtual time: each grant advances a lane by 1/weight
+        self._vtime = {lane: 0.0 for lane in self.weights}
+        self._clock = 0.0
+        # Per lane: last grant, or when its queue became non-empty if that's later
+        self._since = {lane: 0.0 for lane in self.weights}
+        self._served = {lane: 0 for lane in self.weights}
+        self._aged = {lane: 0 for lane in self.weights}
+        self._waits = {lane: deque(maxlen=history) for lane in self.weights}
+
+    def lane(self, name):
+        """Model proxy whose run() is scheduled in the given lane."""
+        if name not in self.weights:
+            raise ValueError(f"Unknown priority '{name}' (expected one of: {', '.join(self.weights)})")
+        return LaneModel(self, name)
+
+    @contextmanager
+    def slot(self, lane):
+        """Hold a slot (exclusive use of the model), granted in lane priority order."""
+        self.acquire(lane)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def acquire(self, lane):
+        """Wait for a slot in the given lane; pair with release()."""
+        ticket = (object(), time.monotonic())
+        with self._cond:
+            queue = self._queues[lane]
+            if not queue:
+                # An idle lane doesn't bank credit (or starvation time) while it was away
+                self._vtime[lane] = max(self._vtime[lane], self._clock)
+                self._since[lane] = ticket[1]
+            queue.append(ticket)
+
+            while self._in_use >= self.capacity or self._pick() != lane or queue[0] is not ticket:
+                # Timeout so aged waiters are re-evaluated even without a release
+                self._cond.wait(timeout=self.aging)
+
+            queue.popleft()
+            now = time.monotonic()
+            if now - self._since[lane] >= self.aging:
+                self._aged[lane] += 1
+            self._since[lane] = now
+            self._in_use += 1
+            self._clock = self._vtime[lane]
+            self._vtime[lane] += 1.0 / self.weights[lane]
+            self._served[lane] += 1
+            self._waits[lane].append(now - ticket[1])
+
+    def release(self):
+        with self._cond:
+            self._in_use -= 1
+            self._cond.notify_all()
+
+    def _pick(self):
+        """Lane whose head waiter should run next (caller holds the lock)."""
+        active = [lane for lane, queue in self._queues.items() if queue]
+        if not active:
+            return None
+
+        now = time.monotonic()
+        starved = [lane for lane in active if now - self._since[lane] >= self.aging]
+        if starved:
+            return min(starved, key=lambda lane: self._since[lane])
+
+        return min(active, key=lambda lane: (self._vtime[lane], -self.weights[lane]))
+
+    def stats(self):
+        """Per-lane queue depth, throughput and wait-time percentiles (ms)."""
+        with self._cond:
+            snapshot = {
+                lane: (len(self._queues[lane]), self._served[lane], self._aged[lane], list(self._waits[lane]))
+                for lane in self.weights
+            }
+            busy = self._in_use >= self.capacity
+
+        lanes = {}
+        for lane, (queued, served, aged, waits) in snapshot.items():
+            entry = {
+                "weight": self.weights[lane],
+                "queued": queued,
+                "served": served,
+                "aged": aged,
+            }
+            entry.update(wait_percentiles(waits))
+            lanes[lane] = entry
+        return {"busy": busy, "aging_s": self.aging, "lanes": lanes}
+
+
+class LaneModel:
+    """
+    Drop-in stand-in for the model: run() waits for a slot in its lane.
+    Everything else (thresholds, preprocess, ...) is forwarded to the model.
+    """
+
+    def __init__(self, scheduler, lane):
+        self.scheduler = scheduler
+        self.lane = lane
+
+    def __getattr__(self, name):
+        return getattr(self.scheduler.model, name)
+
+    def run(self, img):
+        with self.scheduler.slot(self.lane):
+            return self.scheduler.model.run(img)
+
+    def infer(self, inputs):
+        with self.scheduler.slot(self.lane):
+            return self.scheduler.model.infer(inputs)
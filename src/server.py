@@ -1,22 +1,60 @@
 import base64
+import functools
+import inspect
+import os
 import sys
 import socket
+import threading
+from pathlib import Path
 import numpy as np
 import cv2
+import anyio
 import uvicorn
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.responses import Response
+from fastapi import FastAPI, UploadFile, File, Header, HTTPException, Request
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
 from mcp.server.fastmcp import FastMCP
 from mcp.server.transport_security import TransportSecuritySettings
 from .npu_inference import NPUInference
+from .cropping import run_crop, run_crop_all, MIN_AREA, MAX_OVERLAP
+from .documents import is_multipage, sniff_container, page_count, crop_pages, crop_document_file, PdfAssembler
+from .inference_daemon import RemoteInference
+from .local_transport import crop_buffer, local_peer, PeerCredHTTPProtocol
+from .profiling import profiler, check_sort, DETERMINISTIC
+from .scheduler import InferenceScheduler, LANES, INTERACTIVE, BULK
+from .video import iter_frames, track_crops, KEYFRAME_INTERVAL, MOTION_THRESHOLD, SMOOTHING
+from .replay_inference import RecordingInference, ReplayInference, StubInference
 
 # --- Configuration ---
 MODEL_PATH = "/mnt/merged_ssd/mcp-doc-cropper/yolo11n-seg.rknn"
-PORT = 3099
+PORT = int(os.environ.get("CROPPER_PORT", 3099))
+# Record every inference pass to .npz captures (see replay_inference.py)
+RECORD_DIR = os.environ.get("CROPPER_RECORD_DIR")
+RECORD_IMAGES = os.environ.get("CROPPER_RECORD_IMAGES") == "1"
+# Serve from recorded captures instead of the NPU (off-device testing)
+REPLAY_DIR = os.environ.get("CROPPER_REPLAY_DIR")
+# Serve a synthetic model with this NPU latency (ms) instead (load testing, see loadgen.py)
+STUB_LATENCY_MS = os.environ.get("CROPPER_STUB_LATENCY_MS")
+# Optional Unix domain socket listener for same-host clients (e.g. /run/cropper/cropper.sock)
+UDS_PATH = os.environ.get("CROPPER_UDS")
+# Directory whose files the local API may map besides /dev/shm (e.g. /var/lib/scans/buffers)
+LOCAL_DIR = os.environ.get("CROPPER_LOCAL_DIR")
+# Worker threads for blocking crop work, per priority lane (separate pools, so bulk
+# requests waiting for the NPU can't hold every thread an interactive request needs)
+LANE_THREADS = int(os.environ.get("CROPPER_LANE_THREADS", 16))
+# >1: run that many HTTP worker processes around a single inference daemon (see inference_daemon.py)
+WORKERS = int(os.environ.get("CROPPER_WORKERS", 1))
+# Set by run_workers() for the worker processes: daemon socket and its auth key (hex)
+DAEMON_ADDRESS = os.environ.get("CROPPER_DAEMON")
+DAEMON_KEY = os.environ.get("CROPPER_DAEMON_KEY", "")
 
 # --- Global State ---
 _model = None
+_scheduler = None
+# Serializes lazy loading: a second RKNN context on the NPU must never be created
+_model_lock = threading.Lock()
+# Per-lane anyio CapacityLimiters, created on first use inside the event loop
+_limiters = {}
 
 # --- Helper Functions ---
 def get_local_ip():
@@ -34,17 +72,115 @@ def get_local_ip():
 
 SERVER_IP = "cropper-mcp.local"
 
-def get_model():
-    """Robust, lazy loading of the NPU model."""
-    global _model
-    if _model is not None:
-        return _model
-    
-    print(f"Loading NPU model from {MODEL_PATH}...", file=sys.stderr)
+def numbered_path(path, n):
+    """doc_cropped.jpg -> doc_cropped_<n>.jpg (multi-document outputs)."""
+    return path.with_name(f"{path.stem}_{n}{path.suffix}")
+
+def get_model(priority=INTERACTIVE):
+    """
+    Robust, lazy loading of the NPU model.
+    Returns a proxy whose run() is queued in the given priority lane (see scheduler.py).
+    """
+    global _model, _scheduler
+    if _model is None:
+        # Tools and /api/crop run in worker threads; only one of them may load
+        with _model_lock:
+            if _model is None:
+                model = load_model()
+                if model is None:
+                    return None
+                # In a worker process the daemon schedules; RemoteInference has the same lane()/stats()
+                _scheduler = model if isinstance(model, RemoteInference) else InferenceScheduler(model)
+                _model = model
+    return _scheduler.lane(priority)
+
+def release_model():
+    global _model, _scheduler
+    with _model_lock:
+        if _model:
+            _model.release()
+        _model = None
+        _scheduler = None
+
+def check_priority(priority):
+    """Error message for an unknown priority lane, or None."""
+    if priority not in LANES:
+        return f"Error: Unknown priority '{priority}' (expected one of: {', '.join(LANES)})"
+    return None
+
+def lane_limiter(priority):
+    """Thread limiter of a priority lane (unknown lanes share the interactive one)."""
+    if priority not in LANES:
+        priority = INTERACTIVE
+    if priority not in _limiters:
+        _limiters[priority] = anyio.CapacityLimiter(LANE_THREADS)
+    return _limiters[priority]
+
+async def run_in_lane(priority, fn, *args):
+    """Run blocking crop work in a worker thread from the lane's own thread pool."""
+    return await anyio.to_thread.run_sync(fn, *args, limiter=lane_limiter(priority))
+
+async def iterate_in_lane(priority, iterator):
+    """Async wrapper around a blocking iterator (streamed responses), stepped in the lane's threads."""
+    try:
+        while True:
+            chunk = await run_in_lane(priority, next, iterator, None)
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        iterator.close()
+
+def run_in_thread(fn):
+    """
+    Run a blocking tool in a worker thread of its priority lane. Sync FastMCP tools
+    otherwise run on the event loop and block every other request, so priority lanes
+    could never interleave. Each call counts as one request for the on-demand profiler.
+    """
+    parameter = inspect.signature(fn).parameters.get("priority")
+    default = parameter.default if parameter is not None else INTERACTIVE
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        priority = kwargs.get("priority", default)
+        return await run_in_lane(priority, functools.partial(profiler.call, fn, *args, **kwargs))
+    return wrapper
+
+async def run_profile_session(seconds, requests, mode, sort, limit):
+    """Profile crop requests until the session's time/request limit, then return the report."""
+    if DAEMON_ADDRESS:
+        # The profiler is per process: it would only see this worker's share of the
+        # traffic and none of the daemon's inference time
+        raise RuntimeError("Profiling is not available with CROPPER_WORKERS > 1 - profile a single-process server")
+    check_sort(sort)
+    profiler.start(seconds, requests, mode)
     try:
-        _model = NPUInference(MODEL_PATH)
+        while not profiler.finished():
+            await anyio.sleep(0.1)
+    finally:
+        # Also stops the session if the caller went away
+        profiler.stop()
+    return profiler.report(sort, limit)
+
+def load_model():
+    try:
+        if DAEMON_ADDRESS:
+            print(f"Connecting to inference daemon at {DAEMON_ADDRESS}...", file=sys.stderr)
+            return RemoteInference(DAEMON_ADDRESS, bytes.fromhex(DAEMON_KEY))
+        if STUB_LATENCY_MS is not None:
+            print(f"Using stub model ({STUB_LATENCY_MS} ms per inference)...", file=sys.stderr)
+            model = StubInference(float(STUB_LATENCY_MS) / 1000)
+        elif REPLAY_DIR:
+            print(f"Loading replay captures from {REPLAY_DIR}...", file=sys.stderr)
+            model = ReplayInference(REPLAY_DIR)
+        else:
+            print(f"Loading NPU model from {MODEL_PATH}...", file=sys.stderr)
+            model = NPUInference(MODEL_PATH)
+        if RECORD_DIR:
+            print(f"Recording inference captures to {RECORD_DIR}", file=sys.stderr)
+            model = RecordingInference(model, RECORD_DIR, save_image=RECORD_IMAGES)
         print("NPU Model loaded successfully.", file=sys.stderr)
-        return _model
+        return model
     except Exception as e:
         print(f"CRITICAL ERROR loading NPU model: {e}", file=sys.stderr)
         return None
@@ -64,7 +200,10 @@ mcp = FastMCP(
 
 
 @mcp.tool()
-def crop_image(input_path: str, output_path: str = None) -> str:
+@run_in_thread
+def crop_image(input_path: str, output_path: str = None, multi: bool = False,
+               min_area: float = MIN_AREA, max_overlap: float = MAX_OVERLAP, assemble: bool = False,
+               priority: str = INTERACTIVE) -> str:
     """
     Crop a document image directly on the server.
     Use this when calling from a remote machine - files are processed locally.
@@ -73,12 +212,25 @@ def crop_image(input_path: str, output_path: str = None) -> str:
         input_path: Absolute path to the source image file on the server.
         output_path: Optional absolute path for the result.
                      If not provided, defaults to <original_name>_cropped.<ext>.
+        multi: If True, save EVERY detected document (e.g. several receipts in one photo)
+               as numbered files: <output_name>_1.<ext>, <output_name>_2.<ext>, ...
+        min_area: (multi only) Ignore detections smaller than this fraction of the image.
+        max_overlap: (multi only) Drop detections more than this fraction covered by a larger one.
+        assemble: (PDF/TIFF input only) Write all cropped pages into one PDF at output_path
+                  instead of one image per page (<output_name>_p001.jpg, ...).
+        priority: Scheduling lane - "interactive" (default) or "bulk".
+    
+    Multi-page PDF and TIFF files are processed page by page.
     
     Returns:
         Success message with output path and size, or error/warning message.
     """
     from pathlib import Path
     
+    error = check_priority(priority)
+    if error:
+        return error
+    
     in_file = Path(input_path).resolve()
     
     if not in_file.exists():
@@ -94,17 +246,39 @@ def crop_image(input_path: str, output_path: str = None) -> str:
     
     try:
         # Load model (uses cached instance if already loaded)
-        model = get_model()
+        model = get_model(priority)
         if model is None:
             return f"Error: NPU model not loaded"
         
+        if is_multipage(in_file):
+            pages, no_detection, written = crop_document_file(in_file, out_file, model, assemble, multi, min_area, max_overlap)
+            if not written:
+                return f"Error: No pages could be read from {in_file}"
+            msg = f"Success: {pages} page(s) processed, {len(written)} file(s) written"
+            if no_detection:
+                msg += f" ({no_detection} page(s) with no document detected - saved uncropped)"
+            return msg + "\n" + "\n".join(str(f) for f in written)
+        
         # Read image
         img = cv2.imread(str(in_file))
         if img is None:
             return f"Error: Could not read image: {in_file}"
         
-        # Run crop directly (not via HTTP to avoid self-blocking)
-        cropped_img, was_cropped = run_crop(img, model)
+        if multi:
+            crops, was_cropped = run_crop_all(img, model, min_area, max_overlap)
+            if was_cropped:
+                saved = []
+                for i, crop in enumerate(crops, 1):
+                    crop_file = numbered_path(out_file, i)
+                    cv2.imwrite(str(crop_file), crop)
+                    if not crop_file.exists():
+                        return f"Error: Failed to save output to {crop_file}"
+                    saved.append(f"{crop_file} ({crop_file.stat().st_size // 1024} KB)")
+                return f"Success: {len(saved)} document(s) extracted\n" + "\n".join(saved)
+            cropped_img = crops[0]
+        else:
+            # Run crop directly (not via HTTP to avoid self-blocking)
+            cropped_img, was_cropped = run_crop(img, model)
         
         # Save result
         cv2.imwrite(str(out_file), cropped_img)
@@ -124,7 +298,10 @@ def crop_image(input_path: str, output_path: str = None) -> str:
 
 
 @mcp.tool()
-def crop_batch(directory_path: str, output_directory: str = None, extensions: list[str] = ["jpg", "jpeg", "png"]) -> str:
+@run_in_thread
+def crop_batch(directory_path: str, output_directory: str = None, extensions: list[str] = ["jpg", "jpeg", "png"],
+               multi: bool = False, min_area: float = MIN_AREA, max_overlap: float = MAX_OVERLAP,
+               assemble: bool = False, priority: str = BULK) -> str:
     """
     Crop all images in a directory on the server.
     Processes files one-by-one to prevent memory issues.
@@ -133,18 +310,29 @@ def crop_batch(directory_path: str, output_directory: str = None, extensions: li
         directory_path: Absolute path to folder containing images on the server.
         output_directory: Optional output folder. If None, saves with '_cropped' suffix.
         extensions: File extensions to process (default: jpg, jpeg, png).
+        multi: If True, save every detected document per image as numbered files (<name>_1.<ext>, ...).
+        min_area: (multi only) Ignore detections smaller than this fraction of the image.
+        max_overlap: (multi only) Drop detections more than this fraction covered by a larger one.
+        assemble: For PDF/TIFF files, write one cropped PDF per document instead of one image per page.
+        priority: Scheduling lane - "bulk" (default) or "interactive". Bulk work yields to interactive crops.
+    
+    Add "pdf", "tif" or "tiff" to extensions to include multi-page documents.
     
     Returns:
         Summary of processed files with success/failure/warning status for each.
     """
     from pathlib import Path
     
+    error = check_priority(priority)
+    if error:
+        return error
+    
     dir_path = Path(directory_path).resolve()
     if not dir_path.is_dir():
         return f"Error: Directory not found: {dir_path}"
     
     # Get model once for all images
-    model = get_model()
+    model = get_model(priority)
     if model is None:
         return f"Error: NPU model not loaded"
     
@@ -165,6 +353,16 @@ def crop_batch(directory_path: str, output_directory: str = None, extensions: li
                     out_file = img_file.with_name(f"{img_file.stem}_cropped{img_file.suffix}")
                 
                 try:
+                    if is_multipage(img_file):
+                        pages, no_detection, written = crop_document_file(img_file, out_file, model, assemble, multi, min_area, max_overlap)
+                        if written:
+                            results.append(f"✓ {img_file.name} → {pages} page(s), {len(written)} file(s), {no_detection} page(s) without detection")
+                            success_count += 1
+                        else:
+                            results.append(f"✗ {img_file.name}: no pages could be read")
+                            fail_count += 1
+                        continue
+                    
                     # Read image
                     img = cv2.imread(str(img_file))
                     if img is None:
@@ -172,8 +370,26 @@ def crop_batch(directory_path: str, output_directory: str = None, extensions: li
                         fail_count += 1
                         continue
                     
-                    # Crop directly (no HTTP call to avoid blocking)
-                    cropped_img, was_cropped = run_crop(img, model)
+                    if multi:
+                        crops, was_cropped = run_crop_all(img, model, min_area, max_overlap)
+                        if was_cropped:
+                            crop_files = [numbered_path(out_file, i) for i in range(1, len(crops) + 1)]
+                            for crop_file, crop in zip(crop_files, crops):
+                                cv2.imwrite(str(crop_file), crop)
+                            if all(f.exists() and f.stat().st_size > 1024 for f in crop_files):
+                                names = ", ".join(f.name for f in crop_files)
+                                results.append(f"✓ {img_file.name} → {len(crop_files)} document(s): {names}")
+                                success_count += 1
+                            else:
+                                for f in crop_files:
+                                    f.unlink(missing_ok=True)
+                                results.append(f"✗ {img_file.name}: crop failed (invalid output)")
+                                fail_count += 1
+                            continue
+                        cropped_img = crops[0]
+                    else:
+                        # Crop directly (no HTTP call to avoid blocking)
+                        cropped_img, was_cropped = run_crop(img, model)
                     
                     # Save result
                     cv2.imwrite(str(out_file), cropped_img)
@@ -203,7 +419,117 @@ def crop_batch(directory_path: str, output_directory: str = None, extensions: li
 
 
 @mcp.tool()
-def get_crop_command(input_path: str, output_path: str = None) -> str:
+@run_in_thread
+def crop_video(source_path: str, output_directory: str = None, keyframe_interval: int = KEYFRAME_INTERVAL,
+               motion_threshold: float = MOTION_THRESHOLD, smoothing: float = SMOOTHING, priority: str = BULK) -> str:
+    """
+    Crop every frame of a video file or an ordered directory of frames on the server.
+    Inference only runs on keyframes or when the scene moves; stable frames reuse the
+    tracked box, so throughput is much higher than one NPU pass per frame.
+    
+    Args:
+        source_path: Absolute path to a video file or a folder of frame images (sorted by name).
+        output_directory: Optional output folder. Defaults to <source_name>_cropped/ next to the source.
+        keyframe_interval: Re-run inference at least every N frames (0 = only when motion is detected).
+        motion_threshold: Mean grayscale frame difference (0-255) that triggers a new inference.
+        smoothing: Weight of a new keyframe box vs. the tracked box (1.0 = no smoothing).
+        priority: Scheduling lane - "bulk" (default) or "interactive".
+    
+    Returns:
+        Summary with frame count, number of inference passes and throughput.
+    """
+    import time
+    from pathlib import Path
+    
+    error = check_priority(priority)
+    if error:
+        return error
+    
+    source = Path(source_path).resolve()
+    if not source.exists():
+        return f"Error: Source not found: {source}"
+    
+    if output_directory:
+        out_dir = Path(output_directory).resolve()
+    else:
+        out_dir = source.with_name(f"{source.stem}_cropped")
+    out_dir.mkdir(parents=True, exist_ok=True)
+    
+    model = get_model(priority)
+    if model is None:
+        return f"Error: NPU model not loaded"
+    
+    frame_count = 0
+    inference_count = 0
+    no_detection_count = 0
+    start = time.perf_counter()
+    
+    try:
+        frames = iter_frames(source)
+        for index, crop, was_cropped, inferred in track_crops(frames, model, keyframe_interval, motion_threshold, smoothing):
+            cv2.imwrite(str(out_dir / f"frame_{index:06d}.jpg"), crop)
+            frame_count += 1
+            inference_count += inferred
+            no_detection_count += not was_cropped
+    except Exception as e:
+        return f"Error after {frame_count} frames: {str(e)}"
+    
+    if frame_count == 0:
+        return f"Error: No frames could be read from {source}"
+    
+    elapsed = time.perf_counter() - start
+    return (
+        f"Video complete: {frame_count} frames → {out_dir}\n"
+        f"Inference passes: {inference_count} ({frame_count - inference_count} frames reused the tracked box)\n"
+        f"Frames without a document: {no_detection_count}\n"
+        f"Throughput: {frame_count / elapsed:.1f} frames/s"
+    )
+
+
+@mcp.tool()
+async def get_queue_stats() -> str:
+    """
+    Inference scheduler statistics: per priority lane (interactive / bulk) queue depth,
+    requests served, and recent queue wait-time percentiles in milliseconds.
+    
+    Returns:
+        JSON object with one entry per lane.
+    """
+    import json
+    
+    if _scheduler is None:
+        return "Error: NPU model not loaded"
+    # In a worker process stats() is a daemon round trip: keep it off the event loop
+    stats = await anyio.to_thread.run_sync(_scheduler.stats)
+    return json.dumps(stats, indent=2)
+
+
+@mcp.tool()
+async def profile_crops(seconds: float = 10, requests: int = 0, mode: str = DETERMINISTIC,
+                        sort: str = "cumulative", limit: int = 40) -> str:
+    """
+    Profile the crop paths (decode, inference, postprocess, encode) on the running server.
+    Blocks until the session ends, then returns the aggregated report.
+    
+    Args:
+        seconds: Profile for this many seconds (0 = until `requests` is reached, max 300).
+        requests: Stop after this many crop requests (0 = no request limit).
+        mode: "deterministic" (cProfile per crop request, pstats output) or
+              "sampling" (stack samples of all threads incl. transport, collapsed-stack output).
+        sort: pstats sort key for deterministic mode (cumulative, tottime, calls, ...).
+        limit: Number of functions listed in deterministic mode.
+    
+    Returns:
+        pstats text or collapsed stacks ("frame;frame;frame count" per line).
+    """
+    try:
+        return await run_profile_session(seconds, requests, mode, sort, limit)
+    except (ValueError, RuntimeError) as e:
+        return f"Error: {str(e)}"
+
+
+@mcp.tool()
+def get_crop_command(input_path: str, output_path: str = None, unix_socket: bool = False) -> str:
     """
     [LEGACY - use crop_image instead]
     Generates the terminal command to crop a local document image.
@@ -214,6 +540,8 @@ def get_crop_command(input_path: str, output_path: str = None) -> str:
         output_path: Optional absolute path for the result. 
                      If not provided, defaults to <original_name>_cropped.<ext>.
                      If same as input, handles safe overwrite.
+        unix_socket: Go through the server's Unix domain socket instead of TCP
+                     (same machine only, requires CROPPER_UDS on the server).
     
     Returns:
         The exact 'curl' command to execute in the terminal.
@@ -231,7 +559,13 @@ def get_crop_command(input_path: str, output_path: str = None) -> str:
         out_file = in_file.with_name(f"{in_file.stem}_cropped{in_file.suffix}")
 
     # 2. Construct Server URL (Pointing to the Crop API)
-    url = f"http://{SERVER_IP}:3099/api/crop"
+    url = f"http://{SERVER_IP}:{PORT}/api/crop"
+    curl = "curl -s"
+    if unix_socket:
+        if not UDS_PATH:
+            return "Error: Server has no Unix socket listener (set CROPPER_UDS)"
+        url = "http://localhost/api/crop"
+        curl = f"curl -s --unix-socket '{UDS_PATH}'"
 
 
     # 3. Handle Overwrite Safety
@@ -240,10 +574,10 @@ def get_crop_command(input_path: str, output_path: str = None) -> str:
         temp_out = out_file.with_name(f"tmp_{out_file.name}")
         # Command: crop to temp -> move to original
         # Note: We use 'mv -f' to force overwrite
-        cmd = f"curl -s -F 'file=@{in_file}' '{url}' -o '{temp_out}' && mv -f '{temp_out}' '{out_file}'"
+        cmd = f"{curl} -F 'file=@{in_file}' '{url}' -o '{temp_out}' && mv -f '{temp_out}' '{out_file}'"
     else:
         # Standard case
-        cmd = f"curl -s -F 'file=@{in_file}' '{url}' -o '{out_file}'"
+        cmd = f"{curl} -F 'file=@{in_file}' '{url}' -o '{out_file}'"
 
     return cmd
 
@@ -266,7 +600,7 @@ def get_batch_crop_command(directory_path: str, extensions: list[str] = ["jpg",
     
     dir_path = Path(directory_path).resolve()
     # Construct Server URL
-    url = f"http://{SERVER_IP}:3099/api/crop"
+    url = f"http://{SERVER_IP}:{PORT}/api/crop"
     
     # Build extension glob pattern
     # We use a simple loop over extensions to be shell-agnostic (bash/zsh) safe
@@ -304,7 +638,7 @@ def get_batch_crop_command(directory_path: str, extensions: list[str] = ["jpg",
             fi
             
             # Run Curl
-            curl -s -F "file=@$file" "{url}" -o "$out_path"
+            curl -s -H "X-Crop-Priority: bulk" -F "file=@$file" "{url}" -o "$out_path"
         done
     done
     echo "Batch processing complete."
@@ -314,35 +648,6 @@ def get_batch_crop_command(directory_path: str, extensions: list[str] = ["jpg",
     return " ".join(cmd.split())
 
 
-# --- Core Logic ---
-def run_crop(img: np.ndarray, model) -> tuple[np.ndarray, bool]:
-    """
-    Core cropping logic using NPU backend.
-    Returns: (image, was_cropped) tuple
-    """
-    # Run inference
-    # Returns list of dicts: [{'box': [x1,y1,x2,y2], 'score': float, 'class_id': int}, ...]
-    results = model.run(img)
-    
-    if not results:
-        print("No objects detected. Returning original.", file=sys.stderr)
-        return img, False
-
-    # Find largest box
-    # Box format is [x1, y1, x2, y2]
-    largest_result = max(results, key=lambda x: (x['box'][2] - x['box'][0]) * (x['box'][3] - x['box'][1]))
-    x1, y1, x2, y2 = map(int, largest_result['box'])
-    
-    # Padding
-    h, w = img.shape[:2]
-    padding = 10
-    x1 = max(0, x1 - padding)
-    y1 = max(0, y1 - padding)
-    x2 = min(w, x2 + padding)
-    y2 = min(h, y2 + padding)
-
-    return img[y1:y2, x1:x2], True
-
 # --- FastAPI App ---
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -350,51 +655,241 @@ async def lifespan(app: FastAPI):
     get_model()
     yield
     # Shutdown
-    global _model
-    if _model:
-        _model.release()
-    _model = None
+    release_model()
 
 # --- HTTP Server (FastAPI) for Binary Transfer ---
 crop_api_app = FastAPI(lifespan=lifespan)
 
 @crop_api_app.post("/crop")
-async def http_crop_endpoint(file: UploadFile = File(...)):
+async def http_crop_endpoint(file: UploadFile = File(...), multi: bool = False,
+                             min_area: float = MIN_AREA, max_overlap: float = MAX_OVERLAP, assemble: bool = False,
+                             priority: str = Header(INTERACTIVE, alias="X-Crop-Priority")):
     """
     Direct HTTP endpoint for cropping images. Returns raw image bytes.
     Accepts: multipart/form-data file upload.
+             Optional X-Crop-Priority header: "interactive" (default) or "bulk".
     Returns: image/jpeg with X-Crop-Status header indicating if crop occurred.
+             With ?multi=true: application/x-tar of crop_1.jpg, crop_2.jpg, ...
+             plus an X-Crop-Count header.
+             PDF/multi-page TIFF uploads: application/x-tar of page_001.jpg, ... (page_001_1.jpg with multi),
+             streamed page by page with only an X-Page-Count header (no X-Crop-Status/X-Crop-Count),
+             or a single application/pdf with ?assemble=true plus all three headers.
     """
-    model = get_model()
+    if priority not in LANES:
+        raise HTTPException(status_code=400, detail=check_priority(priority))
+    
+    model = get_model(priority)
     if model is None:
         raise HTTPException(status_code=503, detail="Model not loaded or invalid")
     
     try:
+        container = sniff_container(await file.read(8))
+        await file.seek(0)
+        if container:
+            # Documents are cropped from a file on disk, never held in memory as a whole
+            document = await run_in_lane(priority, spool_document, file.file, container)
+            if document is not None:
+                return await run_in_lane(priority, profiler.call, crop_document_upload, document, model,
+                                         assemble, multi, min_area, max_overlap, priority)
         contents = await file.read()
-        nparr = np.frombuffer(contents, np.uint8)
-        img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        # Crop off the event loop so interactive requests can overtake queued bulk work
+        return await run_in_lane(priority, profiler.call, crop_upload, contents, model, multi, min_area, max_overlap, assemble)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@crop_api_app.get("/stats")
+async def http_stats_endpoint():
+    """Per-lane queue depth and wait-time percentiles of the inference scheduler."""
+    if _scheduler is None:
+        raise HTTPException(status_code=503, detail="Model not loaded or invalid")
+    return await anyio.to_thread.run_sync(_scheduler.stats)
+
+@crop_api_app.get("/admin/profile", response_class=PlainTextResponse)
+async def http_profile_endpoint(seconds: float = 10, requests: int = 0, mode: str = DETERMINISTIC,
+                                sort: str = "cumulative", limit: int = 40):
+    """
+    Profile crop requests for `seconds` and/or `requests`, then return the report.
+    mode=deterministic: cProfile pstats text. mode=sampling: collapsed stacks of all threads.
+    """
+    try:
+        return await run_profile_session(seconds, requests, mode, sort, limit)
+    except (ValueError, RuntimeError) as e:
+        raise HTTPException(status_code=409 if isinstance(e, RuntimeError) else 400, detail=str(e))
+
+@crop_api_app.post("/local/crop")
+async def http_local_crop_endpoint(request: Request, priority: str = Header(INTERACTIVE, alias="X-Crop-Priority")):
+    """
+    Same-host fast path: crop an image straight out of a shared-memory segment or
+    mmap-able file, with no upload/download. Only accepted over the Unix socket; buffers
+    must be in /dev/shm (or CROPPER_LOCAL_DIR) and owned by the connecting user.
+    Accepts: JSON descriptor, e.g. {"shm": "scan0", "shape": [3000, 2000, 3], "write": true}
+             (see local_transport.crop_buffer for all keys).
+    Returns: JSON with status and crop box; with "write", the crop is written back into the buffer.
+    """
+    peer = local_peer(request)
+    if peer is None:
+        raise HTTPException(status_code=403, detail="Local crop API is only available over the Unix socket (CROPPER_UDS)")
+    if priority not in LANES:
+        raise HTTPException(status_code=400, detail=check_priority(priority))
+    
+    model = get_model(priority)
+    if model is None:
+        raise HTTPException(status_code=503, detail="Model not loaded or invalid")
+    
+    try:
+        spec = await request.json()
+        if not isinstance(spec, dict):
+            raise ValueError("Descriptor must be a JSON object")
+        return await run_in_lane(priority, profiler.call, crop_buffer, spec, model, peer, LOCAL_DIR)
+    except PermissionError as e:
+        raise HTTPException(status_code=403, detail=str(e))
+    except (ValueError, TypeError, OSError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+def crop_upload(contents, model, multi, min_area, max_overlap, assemble):
+    """Blocking part of /api/crop: decode, crop and encode one upload."""
+    nparr = np.frombuffer(contents, np.uint8)
+    img = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    
+    if img is None:
+        raise HTTPException(status_code=400, detail="Invalid image data")
         
-        if img is None:
-            raise HTTPException(status_code=400, detail="Invalid image data")
-            
-        cropped_img, was_cropped = run_crop(img, model)
+    if multi:
+        crops, was_cropped = run_crop_all(img, model, min_area, max_overlap)
+        headers = {
+            "X-Crop-Status": "cropped" if was_cropped else "no-detection",
+            "X-Crop-Count": str(len(crops) if was_cropped else 0),
+        }
+        return Response(content=tar_crops(crops), media_type="application/x-tar", headers=headers)
+
+    cropped_img, was_cropped = run_crop(img, model)
+    
+    _, buffer = cv2.imencode('.jpg', cropped_img)
+    
+    # Return with header indicating crop status
+    headers = {"X-Crop-Status": "cropped" if was_cropped else "no-detection"}
+    return Response(content=buffer.tobytes(), media_type="image/jpeg", headers=headers)
+
+class _TarChunks:
+    """Write-only sink for tarfile's stream mode; drain() hands out what was written so far."""
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+def iter_tar(entries):
+    """
+    Yield a tar of JPEGs chunk by chunk from (name, image) pairs.
+    entries may be a generator - images are encoded (and dropped) one at a time.
+    """
+    import io
+    import tarfile
+
+    out = _TarChunks()
+    with tarfile.open(fileobj=out, mode="w|") as tar:
+        for name, img in entries:
+            data = cv2.imencode('.jpg', img)[1].tobytes()
+            info = tarfile.TarInfo(name=name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+            yield out.drain()
+    yield out.drain()
+
+def tar_images(entries):
+    """Pack (name, image) pairs into an in-memory tar of JPEGs."""
+    return b"".join(iter_tar(entries))
+
+def tar_crops(crops):
+    """Pack crops as crop_1.jpg, crop_2.jpg, ... into an in-memory tar archive."""
+    return tar_images((f"crop_{i}.jpg", crop) for i, crop in enumerate(crops, 1))
+
+def spool_document(upload, suffix):
+    """
+    Copy an uploaded PDF/TIFF to a temporary file (decoders need a seekable file).
+    Returns its path, or None for a single-page TIFF, which is cropped as an ordinary image.
+    """
+    import shutil
+    import tempfile
+    
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+        shutil.copyfileobj(upload, tmp)
+    upload.seek(0)
+    if is_multipage(tmp.name):
+        return Path(tmp.name)
+    os.unlink(tmp.name)
+    return None
+
+def crop_document_upload(path, model, assemble, multi, min_area, max_overlap, priority=INTERACTIVE):
+    """
+    Crop a spooled PDF/TIFF page by page, deleting the file when done.
+    Returns a tar of pages streamed one page at a time, or an assembled PDF.
+    """
+    def page_crops(stats=None):
+        pages = crop_pages(path, model, multi=multi, min_area=min_area, max_overlap=max_overlap)
+        for page_number, crops, was_cropped in pages:
+            if stats is not None:
+                stats["cropped"] += was_cropped
+                stats["crops"] += len(crops)
+            for i, crop in enumerate(crops, 1):
+                yield f"page_{page_number:03d}" + (f"_{i}" if multi and was_cropped else "") + ".jpg", crop
+    
+    def stream():
+        try:
+            yield from iter_tar(page_crops())
+        finally:
+            path.unlink(missing_ok=True)
+    
+    streaming = False
+    try:
+        pages = page_count(path)
+        if pages == 0:
+            raise HTTPException(status_code=400, detail="Invalid document data")
         
-        _, buffer = cv2.imencode('.jpg', cropped_img)
+        if not assemble:
+            # Crop counts are only known at the end of the stream, so only the page count is sent
+            streaming = True
+            return StreamingResponse(iterate_in_lane(priority, stream()), media_type="application/x-tar",
+                                     headers={"X-Page-Count": str(pages)})
         
-        # Return with header indicating crop status
-        headers = {"X-Crop-Status": "cropped" if was_cropped else "no-detection"}
-        return Response(content=buffer.tobytes(), media_type="image/jpeg", headers=headers)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        stats = {"cropped": 0, "crops": 0}
+        assembler = PdfAssembler()
+        for _, crop in page_crops(stats):
+            assembler.add(crop)
+        headers = {
+            "X-Crop-Status": "cropped" if stats["cropped"] else "no-detection",
+            "X-Page-Count": str(pages),
+            "X-Crop-Count": str(stats["crops"]),
+        }
+        return Response(content=assembler.tobytes(), media_type="application/pdf", headers=headers)
+    finally:
+        # A streamed response deletes the file itself once the last page is sent
+        if not streaming:
+            path.unlink(missing_ok=True)
 
 # --- Server Execution ---
-async def run_dual_servers():
-    import uvicorn
+def create_app():
+    """
+    Combined Starlette app:
+    - /mcp -> MCP Streamable HTTP endpoint
+    - /api/crop -> Direct crop API
+    Also used as the uvicorn app factory for each worker process in multi-worker mode.
+    """
     import contextlib
     from starlette.applications import Starlette
     from starlette.routing import Mount
     
-    # Create combined app with both MCP (streamable-http) and Crop API
     @contextlib.asynccontextmanager
     async def lifespan(app: Starlette):
         # Pre-load NPU model at startup to avoid timeout on first request
@@ -403,40 +898,112 @@ async def run_dual_servers():
         async with mcp.session_manager.run():
             yield
         # Cleanup model on shutdown
-        global _model
-        if _model:
-            _model.release()
-            _model = None
-    
-    # Combined Starlette app:
-    # - /mcp -> MCP Streamable HTTP endpoint
-    # - /api/crop -> Direct crop API
+        release_model()
     
     # Set streamable_http_path to root so endpoint is at /mcp not /mcp/mcp
     mcp.settings.streamable_http_path = "/"
     
-    combined_app = Starlette(
+    return Starlette(
         routes=[
             Mount("/mcp", app=mcp.streamable_http_app()),
             Mount("/api", app=crop_api_app),
         ],
         lifespan=lifespan,
     )
+
+async def run_dual_servers():
+    import uvicorn
+    
+    combined_app = create_app()
     
     # Single server on port 3099
-    config = uvicorn.Config(app=combined_app, host="0.0.0.0", port=3099, log_config=None)
+    # PeerCredHTTPProtocol: the local API authorizes Unix-socket clients by SO_PEERCRED
+    config = uvicorn.Config(app=combined_app, host="0.0.0.0", port=PORT, log_config=None,
+                            http=PeerCredHTTPProtocol)
     server = uvicorn.Server(config)
 
-    print("Starting Server on port 3099:", file=sys.stderr)
-    print("  - MCP endpoint: http://0.0.0.0:3099/mcp", file=sys.stderr)
-    print("  - Crop API: http://0.0.0.0:3099/api/crop", file=sys.stderr)
+    print(f"Starting Server on port {PORT}:", file=sys.stderr)
+    print(f"  - MCP endpoint: http://0.0.0.0:{PORT}/mcp", file=sys.stderr)
+    print(f"  - Crop API: http://0.0.0.0:{PORT}/api/crop", file=sys.stderr)
     
-    await server.serve()
+    if not UDS_PATH:
+        await server.serve()
+        return
+    
+    # Same app on TCP and a Unix socket: one uvicorn server, two listening sockets
+    sockets = [config.bind_socket(), bind_unix_socket(UDS_PATH)]
+    print(f"  - Unix socket: {UDS_PATH} (local API: /api/local/crop)", file=sys.stderr)
+    try:
+        await server.serve(sockets=sockets)
+    finally:
+        for sock in sockets:
+            sock.close()
+        Path(UDS_PATH).unlink(missing_ok=True)
+
+def run_workers(workers):
+    """
+    Multi-process mode: one inference daemon owns the model, `workers` uvicorn
+    processes handle HTTP/MCP, codecs, pre- and postprocessing on the other cores.
+    """
+    import multiprocessing
+    import tempfile
+    import uvicorn
+    from . import inference_daemon
+    
+    if RECORD_DIR:
+        # The daemon only sees tensors, the workers see the rest of each pass
+        print("CRITICAL ERROR: CROPPER_RECORD_DIR is not supported with CROPPER_WORKERS > 1", file=sys.stderr)
+        return
+    if UDS_PATH:
+        print("Warning: CROPPER_UDS is not supported with CROPPER_WORKERS > 1 - TCP only", file=sys.stderr)
+    
+    address = os.path.join(tempfile.gettempdir(), f"cropper-daemon-{os.getpid()}.sock")
+    authkey = os.urandom(16)
+    
+    # spawn: the daemon must not inherit anything from this process but the environment
+    ctx = multiprocessing.get_context("spawn")
+    ready = ctx.Event()
+    daemon = ctx.Process(target=inference_daemon.serve, args=(address, authkey, load_model),
+                         kwargs={"ready": ready}, name="cropper-inference")
+    daemon.start()
+    
+    print("Starting inference daemon...", file=sys.stderr)
+    while not ready.wait(timeout=1):
+        if not daemon.is_alive():
+            print("CRITICAL ERROR: inference daemon failed to start", file=sys.stderr)
+            return
+    
+    # Inherited by the uvicorn workers, which connect in load_model()
+    os.environ["CROPPER_DAEMON"] = address
+    os.environ["CROPPER_DAEMON_KEY"] = authkey.hex()
+    
+    print(f"Starting Server on port {PORT} with {workers} worker processes:", file=sys.stderr)
+    print(f"  - MCP endpoint: http://0.0.0.0:{PORT}/mcp", file=sys.stderr)
+    print(f"  - Crop API: http://0.0.0.0:{PORT}/api/crop", file=sys.stderr)
+    try:
+        uvicorn.run("src.server:create_app", factory=True, host="0.0.0.0", port=PORT,
+                    workers=workers, log_config=None)
+    finally:
+        daemon.terminate()
+        daemon.join()
+
+def bind_unix_socket(path):
+    """Bind a Unix stream socket, replacing a stale one. Owner and group only."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.unlink(missing_ok=True)
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.bind(str(path))
+    os.chmod(path, 0o660)
+    return sock
 
 if __name__ == "__main__":
     import asyncio
     try:
-        asyncio.run(run_dual_servers())
+        if WORKERS > 1:
+            run_workers(WORKERS)
+        else:
+            asyncio.run(run_dual_servers())
     except KeyboardInterrupt:
         print("Servers stopped.")
 
@@ -0,0 +1,133 @@
+"""
+Video / frame-sequence cropping with temporal box tracking.
+
+Document-camera recordings are mostly static, so running the NPU on every
+frame is wasted work. track_crops() only runs inference on keyframes or when
+a cheap frame-difference metric says the scene moved; in between, the last
+(smoothed) box is reused and the crop is emitted without inference.
+"""
+import sys
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from .cropping import find_crop_box
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".tif", ".tiff", ".webp"}
+
+# Re-run inference at least every N frames (0 = only on motion)
+KEYFRAME_INTERVAL = 30
+# Mean absolute difference (0-255) of 64x64 grayscale thumbnails that counts as motion
+MOTION_THRESHOLD = 8.0
+# Weight of a new keyframe box vs. the tracked one (1.0 = no smoothing)
+SMOOTHING = 0.5
+
+_THUMB_SIZE = (64, 64)
+
+
+def iter_frames(source):
+    """
+    Lazily yield (index, frame) from a video file or an ordered directory of frames.
+    Only one decoded frame is held at a time.
+    """
+    source = Path(source)
+    if source.is_dir():
+        files = sorted(f for f in source.iterdir() if f.suffix.lower() in IMAGE_EXTENSIONS)
+        for index, frame_file in enumerate(files):
+            frame = cv2.imread(str(frame_file))
+            if frame is None:
+                print(f"Warning: could not read frame {frame_file}", file=sys.stderr)
+                continue
+            yield index, frame
+        return
+
+    cap = cv2.VideoCapture(str(source))
+    if not cap.isOpened():
+        raise RuntimeError(f"Could not open video: {source}")
+    try:
+        index = 0
+        while True:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            yield index, frame
+            index += 1
+    finally:
+        cap.release()
+
+
+def thumbnail(frame):
+    """Small grayscale thumbnail used for the frame-difference metric."""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    return cv2.resize(gray, _THUMB_SIZE, interpolation=cv2.INTER_AREA)
+
+
+def motion_score(thumb_a, thumb_b):
+    """Mean absolute pixel difference between two thumbnails (0-255)."""
+    return float(np.mean(cv2.absdiff(thumb_a, thumb_b)))
+
+
+class BoxTracker:
+    """
+    Decides when a frame needs inference and keeps the smoothed crop box between keyframes.
+    """
+
+    def __init__(self, keyframe_interval=KEYFRAME_INTERVAL, motion_threshold=MOTION_THRESHOLD, smoothing=SMOOTHING):
+        self.keyframe_interval = keyframe_interval
+        self.motion_threshold = motion_threshold
+        self.smoothing = smoothing
+
+        self.box = None           # Tracked (x1, y1, x2, y2), or None if the last inference found nothing
+        self._ref_thumb = None    # Thumbnail of the last inferred frame
+        self._ref_shape = None
+        self._since_inference = 0
+        self.inferences = 0
+
+    def needs_inference(self, frame, thumb):
+        if self._ref_thumb is None or frame.shape != self._ref_shape:
+            return True, True
+        if motion_score(thumb, self._ref_thumb) > self.motion_threshold:
+            return True, True
+        if self.keyframe_interval and self._since_inference >= self.keyframe_interval:
+            return True, False
+        return False, False
+
+    def update(self, frame, model):
+        """
+        Returns (box, inferred) for this frame. box is None if no document is tracked.
+        """
+        thumb = thumbnail(frame)
+        infer, moved = self.needs_inference(frame, thumb)
+
+        if not infer:
+            self._since_inference += 1
+            return self.box, False
+
+        box = find_crop_box(frame, model)
+        self.inferences += 1
+        self._since_inference = 1
+        self._ref_thumb = thumb
+        self._ref_shape = frame.shape
+
+        # Smooth only across periodic keyframes of a still scene; jump on motion
+        if box is not None and self.box is not None and not moved:
+            a = self.smoothing
+            box = tuple(int(round(a * n + (1 - a) * o)) for n, o in zip(box, self.box))
+        self.box = box
+        return self.box, True
+
+
+def track_crops(frames, model, keyframe_interval=KEYFRAME_INTERVAL, motion_threshold=MOTION_THRESHOLD, smoothing=SMOOTHING):
+    """
+    Generator: crop a stream of (index, frame) pairs with temporal box tracking.
+    Yields (index, crop, was_cropped, inferred).
+    """
+    tracker = BoxTracker(keyframe_interval, motion_threshold, smoothing)
+    for index, frame in frames:
+        box, inferred = tracker.update(frame, model)
+        if box is None:
+            yield index, frame, False, inferred
+        else:
+            x1, y1, x2, y2 = box
+            yield index, frame[y1:y2, x1:x2], True, inferred
@@ -0,0 +1,59 @@
+"""
+InferenceScheduler under a deep bulk backlog: interactive requests must keep
+getting through in weighted order instead of queueing FIFO behind bulk work.
+
+    python -m pytest test/test_scheduler.py
+"""
+import threading
+import time
+
+import numpy as np
+
+from src.scheduler import InferenceScheduler, INTERACTIVE, BULK
+
+
+class SleepModel:
+    def __init__(self, latency):
+        self.latency = latency
+
+    def run(self, img):
+        time.sleep(self.latency)
+        return []
+
+
+def test_interactive_not_fifo_behind_bulk_backlog():
+    latency = 0.01
+    aging = 0.2
+    # 40 bulk callers x 10 ms = 0.4 s of backlog, twice the aging threshold
+    bulk_callers = 40
+    scheduler = InferenceScheduler(SleepModel(latency), aging=aging)
+    stop = threading.Event()
+
+    def bulk_loop():
+        lane = scheduler.lane(BULK)
+        while not stop.is_set():
+            lane.run(None)
+
+    threads = [threading.Thread(target=bulk_loop, daemon=True) for _ in range(bulk_callers)]
+    for t in threads:
+        t.start()
+    try:
+        # Let the backlog build up past the aging threshold
+        time.sleep(2 * aging)
+        interactive = scheduler.lane(INTERACTIVE)
+        waits = []
+        for _ in range(20):
+            start = time.monotonic()
+            interactive.run(None)
+            waits.append(time.monotonic() - start - latency)
+    finally:
+        stop.set()
+        for t in threads:
+            t.join()
+
+    # FIFO would make each interactive call wait for the whole backlog (~0.4 s)
+    assert np.median(waits) < aging / 2
+    stats = scheduler.stats()["lanes"]
+    assert stats[INTERACTIVE]["aged"] == 0
+    # Bulk still progresses through lane aging
+    assert stats[BULK]["served"] > bulk_callers